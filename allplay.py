@@ -0,0 +1,126 @@
+# All-play records and expected wins
+#
+# Each team's weekly score is compared against every other team's score that
+# week, as if it had played the whole league. Summing those fractional wins
+# over a season gives expected wins, which strips schedule luck out of W-L.
+import numpy as np
+from collections import defaultdict
+import history
+import memory
+import tracing
+
+_cache = memory.Cache('allplay')
+_seasons = memory.Cache('allplay.seasons')  # (year, fetched_at) -> that season's results
+
+
+def score_matrix(data):
+    '''Build the season x week x team regular-season score matrix (NaN = no game)'''
+    years = sorted(data['seasons'])
+    owners = [[t['owner_id'] for t in data['seasons'][y]['teams']] for y in years]
+    n_weeks = max((data['seasons'][y]['reg_season_count'] for y in years), default=0)
+    n_teams = max((len(o) for o in owners), default=0)
+
+    scores = np.full((len(years), n_weeks, n_teams), np.nan)
+    for s, year in enumerate(years):
+        slot = {oid: i for i, oid in enumerate(owners[s])}
+        for g in data['seasons'][year]['games']:
+            if not g['final'] or g['playoff']:
+                continue
+            w = g['week'] - 1
+            scores[s, w, slot[g['home_id']]] = g['home_score']
+            scores[s, w, slot[g['away_id']]] = g['away_score']
+    return years, owners, scores
+
+
+def all_play(scores):
+    '''Per season x team all-play wins, losses, ties and expected wins'''
+    a = scores[..., :, None]
+    b = scores[..., None, :]
+    wins = (a > b).sum(axis=-1)
+    losses = (a < b).sum(axis=-1)
+    played = ~np.isnan(scores)
+    # a team ties itself every week, so drop that from the count
+    ties = (a == b).sum(axis=-1) - played
+
+    opponents = played.sum(axis=-1, keepdims=True) - 1
+    share = np.where(played & (opponents > 0), (wins + 0.5 * ties) / np.maximum(opponents, 1), 0.0)
+
+    return {
+        'wins': wins.sum(axis=1),
+        'losses': losses.sum(axis=1),
+        'ties': ties.sum(axis=1),
+        'expected_wins': share.sum(axis=1),
+    }
+
+
+@tracing.traced('allplay.compute')
+def compute(data):
+    '''All-play results keyed by year, then owner id (cached per data version)'''
+    version = history.data_version(data)
+    cached = _cache.get(version)
+    if cached is not None:
+        return cached
+
+    # seasons are independent, so only seasons whose data changed are recomputed
+    results = {}
+    stale = {}
+    for year, season in data['seasons'].items():
+        results[year] = _seasons.get((year, season['fetched_at']))
+        if results[year] is None:
+            stale[year] = season
+    if stale:
+        results.update(_compute_seasons(stale))
+
+    _seasons.clear()
+    _seasons.update({(year, data['seasons'][year]['fetched_at']): season for year, season in results.items()})
+    _cache.clear()
+    _cache[version] = results
+    return results
+
+
+def _compute_seasons(seasons):
+    years, owners, scores = score_matrix({'seasons': seasons})
+    totals = all_play(scores)
+
+    results = {}
+    for s, year in enumerate(years):
+        teams = {t['owner_id']: t for t in seasons[year]['teams']}
+        records = actual_records(seasons[year])
+        season = {}
+        for i, owner_id in enumerate(owners[s]):
+            team = teams[owner_id]
+            actual = records[owner_id]
+            expected = round(float(totals['expected_wins'][s, i]), 2)
+            season[owner_id] = {
+                'owner': team['owner_name'],
+                'team': team['team_name'],
+                'allplay_wins': int(totals['wins'][s, i]),
+                'allplay_losses': int(totals['losses'][s, i]),
+                'allplay_ties': int(totals['ties'][s, i]),
+                'expected_wins': expected,
+                'wins': actual[0],
+                'losses': actual[1],
+                'ties': actual[2],
+                'luck': round(actual[0] + 0.5 * actual[2] - expected, 2),
+            }
+        results[year] = season
+    return results
+
+
+def actual_records(season):
+    '''Regular-season [wins, losses, ties] per owner from the archived games'''
+    records = defaultdict(lambda: [0, 0, 0])
+    for g in season['games']:
+        if not g['final'] or g['playoff']:
+            continue
+        diff = g['home_score'] - g['away_score']
+        if diff > 0:
+            records[g['home_id']][0] += 1
+            records[g['away_id']][1] += 1
+        elif diff < 0:
+            records[g['away_id']][0] += 1
+            records[g['home_id']][1] += 1
+        else:
+            records[g['home_id']][2] += 1
+            records[g['away_id']][2] += 1
+    return records
@@ -1,194 +1,243 @@
 # Football API
-from espn_api.football import League
-from flask import Flask, render_template
-from collections import defaultdict
+from flask import Flask, render_template, abort, jsonify, request
 import os
+import hmac
+import espn_http
+import history
+import season_store
+import allplay
+import playoff_odds
+import singleflight
+import leaderboards
+import trends
+import h2h
+import owners
+import players
+import draft
+import memory
+import profiling
+import tracing
+import compression
+import assets
+import health
 
 app = Flask(__name__)
+# one trace span per request; everything the route calls nests under it
+tracing.install(app)
+# gzip / brotli for pages and JSON, cached by content hash
+compression.install(app)
+# fingerprinted CSS / JS bundles: {{ asset_url('pages.css') }}
+app.jinja_env.globals['asset_url'] = assets.url
+# per-request profiles, only when PROFILE_SECRET is configured
+profiling.install(app)
 
 # Init
 LEAGUE_ID = 284843139
 ESPN_S2 = os.environ.get("ESPN_S2")
 SWID = os.environ.get("SWID")
+# /debug/ endpoints answer only requests carrying this token
+DEBUG_SECRET = os.environ.get("DEBUG_SECRET") or profiling.PROFILE_SECRET
 
-league = League(league_id=LEAGUE_ID, year=2021, espn_s2=ESPN_S2, swid=SWID)
+HOME_SEASON = 2021  # the season the home page shows
+
+def get_history():
+    # every worker maps the same read-only store; only one of them refreshes it
+    return season_store.current().to_history()
+
+# Concurrent requests that need the same season share one ESPN call
+def load_league(year):
+    return singleflight.do(
+        ('league', LEAGUE_ID, year),
+        lambda: espn_http.league(LEAGUE_ID, year, espn_s2=ESPN_S2, swid=SWID)
+    )
+
+# fetched by the first request or warm-up that needs it, not at import
+home_league = health.lazy_league('home', lambda: load_league(HOME_SEASON))
 
 @app.route('/')
 def home():
+    league = home_league()
     teams = sorted(league.teams, key=lambda x: x.standing)
     matchups = league.scoreboard()
-    return render_template('index.html', teams=teams, matchups=matchups)
+    season_allplay = allplay.compute(get_history()).get(league.year, {})
+    allplay_by_team = {team.team_id: season_allplay.get(history.owner_info(team)[0]) for team in teams}
+    return render_template('index.html', teams=teams, matchups=matchups, allplay=allplay_by_team)
+
+@app.route('/api/allplay')
+def allplay_json():
+    results = allplay.compute(get_history())
+    return jsonify({str(year): season for year, season in results.items()})
 
 @app.route('/headtohead')
 def head_to_head():
-    seasons = range(2021, 2024)  # Adjust for your league's years
-    head_to_head_records = defaultdict(lambda: defaultdict(lambda: [0, 0]))  # wins, losses
-    owner_id_to_name = {}
-    owner_id_to_logo = {}
-
-    for year in seasons:
-        try:
-            season_league = League(
-                league_id=LEAGUE_ID,
-                year=year,
-                espn_s2=ESPN_S2,
-                swid=SWID
-            )
-        except Exception as e:
-            print(f"Error loading league for {year}: {e}")
-            continue
-
-        for week in range(1, 18):  # 17 weeks regular season max
-            try:
-                scoreboard = season_league.scoreboard(week)
-            except:
-                continue
-
-            for matchup in scoreboard:
-                home = matchup.home_team
-                away = matchup.away_team
-
-                if not home or not away:
-                    continue
-
-                # Get owner info safely
-                def get_owner_info(team):
-                    if team.owners and len(team.owners) > 0:
-                        owner = team.owners[0]
-                        return owner.get('id', 'unknown_id'), owner.get('displayName', 'Unknown')
-                    return 'unknown_id', 'Unknown'
-
-                # # Collect logos (use the most recent logo you find for the owner)
-                home_id, home_name = get_owner_info(home)
-                away_id, away_name = get_owner_info(away)
-                # if home_id not in owner_id_to_logo and hasattr(home, 'logo'):
-                #     owner_id_to_logo[home_id] = home.logo or ''
-                # if away_id not in owner_id_to_logo and hasattr(away, 'logo'):
-                #     owner_id_to_logo[away_id] = away.logo or ''
-
-                # Save mapping for display
-                owner_id_to_name[home_id] = home_name
-                owner_id_to_name[away_id] = away_name
-
-                home_score = matchup.home_score
-                away_score = matchup.away_score
-
-                if home_score > away_score:
-                    head_to_head_records[home_id][away_id][0] += 1
-                    head_to_head_records[away_id][home_id][1] += 1
-                elif away_score > home_score:
-                    head_to_head_records[away_id][home_id][0] += 1
-                    head_to_head_records[home_id][away_id][1] += 1
-                # ties ignored
-
-    owner_ids = sorted(owner_id_to_name.keys(), key=lambda oid: owner_id_to_name[oid].lower())
-    table = []
-
-    for oid in owner_ids:
-        row = {'owner_id': oid, 'owner_name': owner_id_to_name[oid], 'record': {}}
-        for opponent_id in owner_ids:
-            if opponent_id == oid:
-                row['record'][opponent_id] = '—'
-            else:
-                wins, losses = head_to_head_records[oid][opponent_id]
-                row['record'][opponent_id] = f'{wins}-{losses}'
-        table.append(row)
-
+    matrices = h2h.get(get_history())
+    start = request.args.get('from', type=int)
+    end = request.args.get('to', type=int)
+    games = request.args.get('games', 'all')
+    if games not in h2h.GAME_TYPES:
+        abort(400)
+
+    owner_ids, table = matrices.table(start, end, games)
     return render_template(
         'headtohead.html',
         table=table,
         owner_ids=owner_ids,
-        owner_id_to_name=owner_id_to_name
+        owner_id_to_name=matrices.names,
+        seasons=matrices.seasons(),
+        range_from=start,
+        range_to=end,
+        games=games
     )
 
 @app.route('/records')
 def league_records():
-    from statistics import mean
-
-    seasons = range(2021, 2024)  # Adjust to your league's active years
-    records = []
-
-    for year in seasons:
-        try:
-            season_league = League(league_id=LEAGUE_ID, year=year, espn_s2=ESPN_S2, swid=SWID)
-        except Exception as e:
-            print(f"Error loading league for {year}: {e}")
+    boards = records_boards()
+
+    category = request.args.get('category')
+    page_num = request.args.get('page', 1, type=int)
+    if category is not None and category not in boards:
+        abort(404)
+
+    shown = [category] if category else [key for key, _, _ in leaderboards.CATEGORIES]
+    tables = []
+    for key in shown:
+        table = leaderboards.page(boards[key], page_num if category else 1)
+        table.update({'key': key, 'title': leaderboards.TITLES[key]})
+        tables.append(table)
+    return render_template('records.html', tables=tables, category=category)
+
+_records = memory.Cache('records')
+
+def records_boards():
+    '''Leaderboards, cached per archive and warehouse version'''
+    data = get_history()
+    # Manager efficiency needs lineups, kept in the player warehouse (2019+);
+    # only finished weeks it hasn't stored yet are fetched from ESPN (the live
+    # week isn't used here, the watcher keeps it current)
+    store = players.sync(data, league_loader=load_league, live=False)
+    key = (history.data_version(data), store.version)
+    return _records.get_or_set(
+        key, lambda: singleflight.do(('view', 'records', key), lambda: build_league_records(data, store),
+                                   shared='records'),
+        clear=True)
+
+@tracing.traced('records.build')
+def build_league_records(data, store):
+    # game and season categories come straight from the archive
+    boards = leaderboards.from_history(data)
+
+    for year in store.seasons():
+        season = data['seasons'].get(year)
+        if season is None:
             continue
+        teams = {t['team_id']: t for t in season['teams']}
+        for team_id, (actual, best) in players.season_efficiency(store, season).items():
+            if best > 0 and team_id in teams:
+                team = teams[team_id]
+                boards.add_efficiency(year, team['owner_name'], team['team_name'], actual / best)
+
+    return boards.to_dict()
+
+@app.route('/playoffs')
+def playoffs():
+    odds = playoff_odds.current_odds(get_history())
+    if odds is None:
+        abort(404)
+    return render_template('playoffs.html', odds=odds)
+
+@app.route('/api/playoffs')
+def playoffs_json():
+    odds = playoff_odds.current_odds(get_history())
+    if odds is None:
+        abort(404)
+    return jsonify(odds)
+
+@app.route('/trends')
+def trend_view():
+    data = get_history()
+    series = trends.get(data)
+    if not series.weeks:
+        abort(404)
+
+    year = request.args.get('season', series.weeks[-1][0], type=int)
+    try:
+        start = trends.parse_point(request.args.get('from'), 0)
+        end = trends.parse_point(request.args.get('to'), 99)
+    except ValueError:
+        abort(400)
+
+    power = series.power_rankings(year)
+    weeks = sorted({p['week'] for s in power.values() for p in s})
+    owners = sorted(power, key=lambda oid: power[oid][-1]['rank'])
+    return render_template(
+        'trends.html',
+        year=year,
+        seasons=sorted(data['seasons']),
+        weeks=weeks,
+        owners=owners,
+        power={oid: {p['week']: p for p in power[oid]} for oid in owners},
+        owner_id_to_name=series.names,
+        totals=sorted(series.totals(start, end).values(), key=lambda r: -r['allplay_pct']),
+        recent=sorted(series.last_weeks().values(), key=lambda r: -r['allplay_pct']),
+        range_from=request.args.get('from', ''),
+        range_to=request.args.get('to', ''),
+        recent_weeks=trends.RECENT_WEEKS
+    )
 
-        highest_game = {'score': 0}
-        lowest_game = {'score': float('inf')}
-        season_scores = defaultdict(float)
-        manager_efficiencies = defaultdict(list)
-
-        for week in range(1, 18):
-            try:
-                scoreboard = season_league.scoreboard(week)
-            except:
-                continue
-
-            for matchup in scoreboard:
-                for team in [matchup.home_team, matchup.away_team]:
-                    if not team:
-                        continue
-
-                    points = team.score
-                    team_name = team.team_name
-                    owners = team.owners
-                    owner_name = owners[0]['displayName'] if owners else 'Unknown'
-
-                    # Record game highs/lows
-                    if points > highest_game['score']:
-                        highest_game = {'score': points, 'team': team_name, 'owner': owner_name, 'week': week}
-                    if points < lowest_game['score']:
-                        lowest_game = {'score': points, 'team': team_name, 'owner': owner_name, 'week': week}
-
-                    # Track season total
-                    season_scores[owner_name] += points
-
-                    # Manager rating (actual / possible)
-                    if hasattr(team, 'lineup') and hasattr(team, 'bench'):
-                        actual = sum(p.points for p in team.lineup if p and hasattr(p, 'points'))
-                        bench = [p for p in team.bench if p and hasattr(p, 'points')]
-                        total_pool = team.lineup + bench
-                        max_possible = 0
-                        used_slots = defaultdict(int)
-
-                        for player in sorted(total_pool, key=lambda p: getattr(p, 'points', 0), reverse=True):
-                            pos = player.position
-                            # Roster limits for manager calc — simplified
-                            max_starters = team.roster.get(pos, 0)
-                            if used_slots[pos] < max_starters:
-                                max_possible += player.points
-                                used_slots[pos] += 1
-
-                        if max_possible > 0:
-                            efficiency = actual / max_possible
-                            manager_efficiencies[owner_name].append(efficiency)
-
-        # Calculate best and worst season scores
-        if season_scores:
-            max_points_owner = max(season_scores.items(), key=lambda x: x[1])
-            min_points_owner = min(season_scores.items(), key=lambda x: x[1])
-        else:
-            max_points_owner = min_points_owner = ('N/A', 0)
-
-        # Best manager efficiency (average over season)
-        best_manager = ('N/A', 0)
-        for owner, efficiencies in manager_efficiencies.items():
-            avg = mean(efficiencies)
-            if avg > best_manager[1]:
-                best_manager = (owner, avg)
-
-        records.append({
-            'year': year,
-            'highest_game': highest_game,
-            'lowest_game': lowest_game,
-            'most_points': max_points_owner,
-            'least_points': min_points_owner,
-            'best_manager': best_manager
-        })
-
-    return render_template('records.html', records=records)
+@app.route('/draft')
+def draft_view():
+    data = get_history()
+    store = players.get()
+    if not store.seasons():
+        store = players.sync(data, league_loader=load_league, live=False)
+    # drafts that were never stored are fetched once; finished ones never again
+    draft.load_drafts(store.seasons(), league_loader=load_league)
+    return render_template('draft.html', analysis=draft.get(data, store))
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    return assets.send(filename, request.accept_encodings)
+
+@app.route('/healthz')
+def healthz():
+    return jsonify(health.liveness())
+
+@app.route('/readyz')
+def readyz():
+    # 503 until this worker's data and caches are loaded; the check starts the warm-up
+    ready, report = health.readiness()
+    return jsonify(report), 200 if ready else 503
+
+@app.route('/debug/memory')
+def memory_report():
+    # this worker's cache keys and sizes against its budget; each gunicorn worker answers for itself.
+    # Cache keys name owners and seasons, so it 404s without ?token= or X-Debug-Token
+    token = request.args.get('token') or request.headers.get('X-Debug-Token')
+    if not DEBUG_SECRET or not token or not hmac.compare_digest(token, DEBUG_SECRET):
+        abort(404)
+    return jsonify(memory.report())
+
+@app.route('/headtohead/<owner_a>/<owner_b>')
+def rivalry(owner_a, owner_b):
+    data = get_history()
+    index = owners.get(data)
+    names = index.names_by_id()
+    if owner_a not in names or owner_b not in names:
+        abort(404)
+
+    # games from every id either franchise has played under
+    ids_a = index.owners[index.key(owner_a)]['ids']
+    ids_b = index.owners[index.key(owner_b)]['ids']
+    games = sorted((g for a in ids_a for b in ids_b for g in data['h2h_index'].get((a, b), [])),
+                   key=lambda g: (g['year'], g['week']), reverse=True)
+    return render_template(
+        'rivalry.html',
+        owner_a=owner_a,
+        owner_b=owner_b,
+        owner_id_to_name=names,
+        games=games,
+        stats=history.rivalry_stats(games)
+    )
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
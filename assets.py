@@ -0,0 +1,153 @@
+# Static asset pipeline
+#
+# The stylesheets and scripts the dashboard pages use are concatenated into
+# bundles named after a hash of their contents (pages.3f2a9c1e04.css) and
+# written with gzip and, when the brotli package is installed, brotli copies
+# to ASSETS_DIR. A bundle's URL changes whenever its contents do, so /assets/
+# responses are cached by browsers for a year and the precompressed copy is
+# sent as is. Third-party files are pinned by version and downloaded once, at
+# startup (gunicorn's on_starting hook) or deploy time (python assets.py) -
+# never while serving a request. If that download fails the pages link the
+# CDN copy instead, until the next build.
+import os
+import json
+import gzip
+import hashlib
+import mimetypes
+import requests
+import history
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+ASSETS_DIR = os.path.join(history.DATA_DIR, "assets")
+VENDOR_DIR = os.path.join(ASSETS_DIR, "vendor")
+MANIFEST_PATH = os.path.join(ASSETS_DIR, "manifest.json")
+BOOTSTRAP = "https://cdn.jsdelivr.net/npm/bootstrap@5.3.2/dist/"
+MAX_AGE = 365 * 24 * 60 * 60  # fingerprinted names never change content
+
+# bundle name -> sources: paths under static/ or pinned third-party URLs
+BUNDLES = {
+    'bootstrap.css': [BOOTSTRAP + 'css/bootstrap.min.css'],
+    'bootstrap.js': [BOOTSTRAP + 'js/bootstrap.bundle.min.js'],
+    'pages.css': ['css/pages.css'],
+}
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]  # preference order
+
+_manifest = {}  # bundle name -> fingerprinted file name, or the CDN URL it falls back to
+
+
+def _vendor(url, fetch):
+    '''Contents of a pinned third-party file, downloaded on first use when fetch is set'''
+    path = os.path.join(VENDOR_DIR, hashlib.sha1(url.encode('utf-8')).hexdigest()[:12] + '-' + url.rsplit('/', 1)[-1])
+    if not os.path.exists(path) and fetch:
+        r = requests.get(url, timeout=10)
+        r.raise_for_status()
+        _write(path, r.content)
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _source(source, fetch):
+    if source.startswith('https://'):
+        return _vendor(source, fetch)
+    with open(os.path.join(STATIC_DIR, source), 'rb') as f:
+        return f.read()
+
+
+def build(fetch=True):
+    '''Write every bundle that isn't built yet and the manifest; returns the manifest
+
+    Without fetch, third-party files that were never downloaded fall back to their CDN URL.
+    '''
+    built = {}
+    for name, sources in BUNDLES.items():
+        try:
+            body = b'\n'.join(_source(s, fetch) for s in sources)
+        except (OSError, requests.RequestException) as e:
+            print(f"Couldn't bundle {name}, linking {sources[0]} instead: {e}")
+            built[name] = sources[0]
+            continue
+        stem, ext = os.path.splitext(name)
+        filename = f"{stem}.{hashlib.sha1(body).hexdigest()[:10]}{ext}"
+        path = os.path.join(ASSETS_DIR, filename)
+        if not os.path.exists(path):
+            _write(path + '.gz', gzip.compress(body, 9, mtime=0))
+            if brotli is not None:
+                _write(path + '.br', brotli.compress(body, quality=11))
+            # the plain file last: its existence means the bundle is complete
+            _write(path, body)
+        built[name] = filename
+    _write(MANIFEST_PATH, json.dumps(built, indent=1).encode('utf-8'))
+    _manifest.clear()
+    _manifest.update(built)
+    return built
+
+
+def manifest():
+    '''The bundles built at startup; built here, without downloading, if startup didn't'''
+    if not _manifest:
+        try:
+            with open(MANIFEST_PATH) as f:
+                loaded = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            loaded = None
+        # a manifest from an older deploy may name bundles that no longer exist
+        if loaded is not None and set(loaded) == set(BUNDLES) and all(
+                f.startswith('https://') or os.path.exists(os.path.join(ASSETS_DIR, f)) for f in loaded.values()):
+            _manifest.update(loaded)
+        else:
+            build(fetch=False)
+    return _manifest
+
+
+def url(name):
+    '''URL of a bundle for templates'''
+    target = manifest()[name]
+    return target if target.startswith('https://') else '/assets/' + target
+
+
+def version():
+    '''Fingerprint of every bundle; pages that link them change with it'''
+    return hashlib.sha1(json.dumps(manifest(), sort_keys=True).encode('utf-8')).hexdigest()[:10]
+
+
+def files():
+    '''Every built file, with its precompressed copies'''
+    built = [f for f in manifest().values() if not f.startswith('https://')]
+    return [f + suffix for f in built for suffix in ['', '.gz', '.br']
+            if os.path.exists(os.path.join(ASSETS_DIR, f + suffix))]
+
+
+def send(filename, accept_encodings):
+    '''Response for /assets/<filename>, precompressed when the client accepts it'''
+    from flask import abort, send_from_directory
+    if filename not in manifest().values():
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+        if encoding in accept_encodings and os.path.exists(os.path.join(ASSETS_DIR, filename + suffix)):
+            response = send_from_directory(ASSETS_DIR, filename + suffix, mimetype=mimetype, max_age=MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(ASSETS_DIR, filename, mimetype=mimetype, max_age=MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+if __name__ == '__main__':
+    # deploy step: download third-party files and write every bundle
+    print(build())
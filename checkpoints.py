@@ -0,0 +1,73 @@
+# Checkpointed multi-step jobs
+#
+# A job is split into named steps whose results are JSON-serialisable. Every
+# finished step is written to DATA_DIR/checkpoints/<job>.json straight away, so
+# when a run dies halfway (ESPN timeout, Sheets 429) the next run replays the
+# finished steps from the file and resumes at the first one that didn't
+# complete. The file is removed once the whole job succeeds, and ignored when
+# it is older than MAX_AGE or was written for different inputs.
+import os
+import json
+import time
+import history
+import tracing
+
+CHECKPOINT_DIR = os.path.join(history.DATA_DIR, "checkpoints")
+MAX_AGE = int(os.environ.get("CHECKPOINT_MAX_AGE", 6 * 60 * 60))  # seconds
+
+
+class Run(object):
+    def __init__(self, job, inputs=None, resume=True):
+        self.path = os.path.join(CHECKPOINT_DIR, job + '.json')
+        self.inputs = inputs
+        self.state = self._load() if resume else None
+        if self.state is None:
+            self.state = {'inputs': inputs, 'started_at': time.time(), 'steps': {}}
+        elif self.state['steps']:
+            print(f"Resuming {job}: {len(self.state['steps'])} steps already done")
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # round-trip the inputs so tuples compare equal to what JSON gave back
+        if state.get('inputs') != json.loads(json.dumps(self.inputs)):
+            return None
+        if time.time() - state.get('started_at', 0) > MAX_AGE:
+            return None
+        return state
+
+    def _save(self):
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp, self.path)
+
+    def done(self, name):
+        return name in self.state['steps']
+
+    def step(self, name, fn):
+        '''Result of fn(), from the checkpoint if this step already finished'''
+        if self.done(name):
+            tracing.cache_outcome('checkpoint', True)
+            return self.state['steps'][name]['result']
+        try:
+            with tracing.span('step', job=os.path.basename(self.path)[:-5], step=name):
+                result = fn()
+        except Exception:
+            print(f"Step '{name}' failed; rerun to resume from here")
+            raise
+        # store what JSON gives back, so a fresh and a resumed run see the same values
+        result = json.loads(json.dumps(result))
+        self.state['steps'][name] = {'finished_at': time.time(), 'result': result}
+        self._save()
+        return result
+
+    def finish(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
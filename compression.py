@@ -0,0 +1,60 @@
+# Response compression
+#
+# Pages and JSON responses are compressed with brotli (when the brotli package
+# is installed) or gzip, whichever the client accepts, and tagged with an ETag
+# of their content so a client that already has the page gets a 304. Pages
+# only change when the archive does, so compressed bodies are cached by the
+# hash of the uncompressed body: each distinct page is compressed once per
+# worker, not once per request.
+import gzip
+import hashlib
+import memory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = 512  # bytes; smaller bodies aren't worth the CPU
+COMPRESSIBLE = {'text/html', 'text/css', 'text/csv', 'text/plain', 'application/json', 'application/javascript'}
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # per-request compression; prebuilt assets use the maximum
+
+_cache = memory.Cache('compressed')
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and 'br' in accept_encodings:
+        return 'br'
+    if 'gzip' in accept_encodings:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding, digest):
+    '''Compressed body, cached by content hash and encoding'''
+    if encoding == 'br':
+        return _cache.get_or_set((digest, encoding), lambda: brotli.compress(body, quality=BROTLI_QUALITY))
+    return _cache.get_or_set((digest, encoding), lambda: gzip.compress(body, GZIP_LEVEL, mtime=0))
+
+
+def install(app):
+    from flask import request
+
+    @app.after_request
+    def _compress(response):
+        if (response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE):
+            return response
+        body = response.get_data()
+        digest = hashlib.sha1(body).hexdigest()
+        encoding = choose_encoding(request.accept_encodings) if len(body) >= MIN_SIZE else None
+
+        response.vary.add('Accept-Encoding')
+        response.set_etag(f"{digest[:20]}-{encoding}" if encoding else digest[:20])
+        response.make_conditional(request)
+        if encoding is None or response.status_code != 200:
+            return response
+        response.set_data(compress(body, encoding, digest))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,140 @@
+# Draft value analysis
+#
+# Each season's draft (stored once by transactions.sync_season) is joined to
+# the season points of every drafted player from the player warehouse. Within
+# a season the drafted players are ranked by points; a pick's value is how many
+# spots better it finished than where it was taken, and its points over
+# expected are its points minus what the player finishing at that draft slot
+# scored. Owner-seasons are graded on total points over expected against every
+# other owner-season in the league's history.
+import numpy as np
+import history
+import memory
+import tracing
+import owners
+import players
+import transactions
+
+GRADES = [(80, 'A'), (60, 'B'), (40, 'C'), (20, 'D'), (0, 'F')]  # minimum percentile, grade
+TOP_PICKS = 10
+
+_cache = memory.Cache('draft')
+
+
+def load_drafts(seasons, league_loader=None):
+    '''{year: draft picks} from the stored transaction logs
+
+    With a league_loader, seasons that were never synced are fetched once;
+    finished seasons are never fetched again.
+    '''
+    drafts = {}
+    for year in seasons:
+        record = transactions.read_season(year)
+        if record is None and league_loader is not None:
+            try:
+                record = transactions.sync_season(year, league_loader(year))
+            except Exception as e:
+                print(f"Failed to load draft for season {year}: {e}")
+        if record and record['draft']:
+            drafts[year] = record['draft']
+    return drafts
+
+
+def season_picks(season, picks, season_points):
+    '''Every pick of one season with its points, value and points over expected'''
+    n_teams = len(season['teams'])
+    overall = np.array([(p['round'] - 1) * n_teams + p['pick'] for p in picks])
+    points = np.array([season_points.get(p['player_id'], 0.0) for p in picks])
+
+    # 1-based rank of every pick by draft order and by points scored
+    pick_rank = np.empty(len(picks), dtype=int)
+    pick_rank[np.argsort(overall, kind='stable')] = np.arange(1, len(picks) + 1)
+    points_rank = np.empty(len(picks), dtype=int)
+    points_rank[np.argsort(-points, kind='stable')] = np.arange(1, len(picks) + 1)
+    expected = np.sort(points)[::-1][pick_rank - 1]
+
+    names = {t['owner_id']: (t['owner_name'], t['team_name']) for t in season['teams']}
+    rows = []
+    for i, p in enumerate(picks):
+        owner, team = names.get(p['owner_id'], ('Unknown', ''))
+        rows.append({
+            'year': season['year'],
+            'owner_id': p['owner_id'],
+            'owner': owner,
+            'team': team,
+            'round': p['round'],
+            'pick': int(pick_rank[i]),
+            'player': p['player_name'],
+            'keeper': p['keeper'],
+            'points': round(float(points[i]), 2),
+            'finish': int(points_rank[i]),
+            'value': int(pick_rank[i] - points_rank[i]),
+            'over_expected': round(float(points[i] - expected[i]), 2),
+        })
+    return rows
+
+
+def _grade(percentile):
+    return next(grade for minimum, grade in GRADES if percentile >= minimum)
+
+
+def analyze(data, store):
+    '''Picks, best / worst picks, owner grades and best pickups for every season with a draft and player stats'''
+    drafts = load_drafts(store.seasons())
+    index = owners.get(data)
+    picks = []
+    for year, draft_picks in sorted(drafts.items()):
+        if year in data['seasons']:
+            picks.extend(season_picks(data['seasons'][year], draft_picks, store.season_points(year)))
+
+    # owner-season totals, graded by percentile over all owner-seasons
+    totals = {}
+    for p in picks:
+        key = (p['year'], index.key(p['owner_id']))
+        total = totals.setdefault(key, {'year': p['year'], 'owner': p['owner'], 'team': p['team'],
+                                        'points': 0, 'over_expected': 0, 'picks': 0})
+        total['points'] += p['points']
+        total['over_expected'] += p['over_expected']
+        total['picks'] += 1
+    seasons = list(totals.values())
+    if seasons:
+        scores = np.array([s['over_expected'] for s in seasons])
+        percentiles = 100 * (np.argsort(np.argsort(scores)) / max(1, len(scores) - 1))
+        for s, pct in zip(seasons, percentiles):
+            s['points'] = round(s['points'], 2)
+            s['over_expected'] = round(s['over_expected'], 2)
+            s['percentile'] = float(pct)
+            s['grade'] = _grade(pct)
+
+    # career: every owner's seasons under one owner key
+    career = {}
+    for (year, key), s in totals.items():
+        c = career.setdefault(key, {'owner': index.name(key), 'seasons': 0, 'over_expected': 0,
+                                    'percentile': 0, 'grades': []})
+        c['seasons'] += 1
+        c['over_expected'] = round(c['over_expected'] + s['over_expected'], 2)
+        c['percentile'] += s['percentile']
+        c['grades'].append(f"{year}: {s['grade']}")
+    for c in career.values():
+        # career grade from the average percentile of the owner's drafts
+        c['grade'] = _grade(c.pop('percentile') / c['seasons'])
+
+    ranked = sorted(picks, key=lambda p: -p['over_expected'])
+    return {
+        'picks': picks,
+        'best': ranked[:TOP_PICKS],
+        'worst': ranked[::-1][:TOP_PICKS],
+        # the other side of the draft: who found the most points after it
+        'pickups': players.best_pickups(data, store, n=TOP_PICKS),
+        'seasons': sorted(seasons, key=lambda s: (-s['year'], -s['over_expected'])),
+        'owners': sorted(career.values(), key=lambda c: -c['over_expected']),
+    }
+
+
+@tracing.traced('draft.get')
+def get(data, store=None):
+    '''Draft analysis, cached per archive and warehouse version'''
+    store = store or players.get()
+    version = (history.data_version(data), tuple(sorted((y, m['synced_at']) for y, m in store.meta.items())),
+               tuple(transactions.stored_at(y) for y in store.seasons()))
+    return _cache.get_or_set(version, lambda: analyze(data, store), clear=True)
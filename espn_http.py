@@ -0,0 +1,103 @@
+# Shared HTTP session for every ESPN request
+#
+# espn_api calls the module-level requests.get for each request, which opens a
+# fresh connection every time and gives up on the first 429 / 5xx. Leagues
+# built here get a request client that goes through one pooled keep-alive
+# session instead: gzip (requests' default Accept-Encoding), at most
+# MAX_CONNECTIONS concurrent connections to ESPN (callers beyond that wait for
+# a free one), a timeout on every request, and retries with exponential
+# backoff that honour Retry-After. A request that still fails raises
+# ESPNRequestFailed naming the endpoint, so callers can't mistake a dropped
+# week for a quiet one. Each team also gets the matchup period of every entry
+# of its schedule, which espn_api reads from the league data but drops.
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import tracing
+from espn_api.football import League
+from espn_api.requests.espn_requests import EspnFantasyRequests, checkRequestStatus
+
+MAX_CONNECTIONS = int(os.environ.get("ESPN_MAX_CONNECTIONS", 4))
+RETRIES = int(os.environ.get("ESPN_RETRIES", 4))
+BACKOFF = float(os.environ.get("ESPN_BACKOFF", 0.5))  # seconds, doubled per retry
+TIMEOUT = (5, 30)  # connect, read seconds
+
+
+class ESPNRequestFailed(Exception):
+    pass
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def session():
+    '''The process-wide pooled session, created on first use'''
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(total=RETRIES, backoff_factor=BACKOFF, status_forcelist=(429, 500, 502, 503, 504),
+                          allowed_methods=('GET',), respect_retry_after_header=True, raise_on_status=False)
+            # pool_block makes callers wait for a free connection instead of opening more
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONNECTIONS, pool_block=True,
+                                  max_retries=retry)
+            s = requests.Session()
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            _session = s
+        return _session
+
+
+class PooledRequests(EspnFantasyRequests):
+    '''espn_api's request client, sending through the shared session'''
+
+    def _get(self, endpoint, params, headers, league_id=None):
+        with tracing.span('espn.request', endpoint=endpoint, view=(params or {}).get('view')) as span:
+            return self._send(span, endpoint, params, headers, league_id)
+
+    def _send(self, span, endpoint, params, headers, league_id):
+        try:
+            r = session().get(endpoint, params=params, headers=headers, cookies=self.cookies, timeout=TIMEOUT)
+        except requests.RequestException as e:
+            raise ESPNRequestFailed(f"ESPN request to {endpoint} failed after {RETRIES} retries: {e}") from e
+        retries = getattr(r.raw, 'retries', None)
+        span.set(status=r.status_code, bytes=len(r.content), retries=len(retries.history) if retries else 0)
+        if r.status_code in (429, 500, 502, 503, 504):
+            raise ESPNRequestFailed(f"ESPN request to {endpoint} failed after {RETRIES} retries: HTTP {r.status_code}")
+        checkRequestStatus(r.status_code, cookies=self.cookies, league_id=league_id)
+        data = r.json()
+        if self.logger:
+            self.logger.log_request(endpoint=endpoint, params=params, headers=headers, response=data)
+        return data
+
+    def get_league(self):
+        data = super().get_league()
+        # kept until league() has read the matchup periods off it
+        self.schedule = data.get('schedule', [])
+        return data
+
+    def league_get(self, params=None, headers=None, extend=''):
+        data = self._get(self.LEAGUE_ENDPOINT + extend, params, headers, league_id=self.league_id)
+        return data if self.year > 2017 else data[0]
+
+    def get(self, params=None, headers=None, extend=''):
+        return self._get(self.ENDPOINT + extend, params, headers)
+
+
+def league(league_id, year, espn_s2=None, swid=None):
+    '''League(...) whose requests, including the initial fetch, use the shared session'''
+    season_league = League(league_id=league_id, year=year, espn_s2=espn_s2, swid=swid, fetch_league=False)
+    old = season_league.espn_request
+    season_league.espn_request = PooledRequests(sport='nfl', year=year, league_id=league_id,
+                                                cookies=old.cookies, logger=old.logger)
+    season_league.fetch_league()
+    schedule = season_league.espn_request.schedule
+    del season_league.espn_request.schedule
+    # team.schedule only lists the matchups a team played in, in this order, so
+    # its positions aren't weeks once a team sits out a playoff week
+    for team in season_league.teams:
+        team.matchup_periods = [m['matchupPeriodId'] for m in schedule
+                                if team.team_id in (m.get('home', {}).get('teamId'), m.get('away', {}).get('teamId'))]
+    return season_league
@@ -0,0 +1,143 @@
+# Local ESPN stand-in
+#
+# A deterministic synthetic league with the parts of the espn_api League
+# surface this project uses (teams, schedule and scores, settings, scoreboard,
+# box scores, draft, recent activity). install() points espn_http.league() at
+# it, so the dashboard, exports and load tests run without ESPN credentials or
+# network access. Every simulated ESPN call sleeps LATENCY seconds to stand in
+# for the real round trip.
+import os
+import time
+import random
+from types import SimpleNamespace
+import history
+import espn_http
+
+LATENCY = float(os.environ.get("STANDIN_LATENCY", 0.05))  # seconds per simulated ESPN call
+TEAMS = 10
+REG_SEASON_WEEKS = 14
+PLAYOFF_WEEKS = 3
+WEEKS_PLAYED = int(os.environ.get("STANDIN_WEEKS_PLAYED", 9))  # of the current season
+SLOT_COUNTS = {'QB': 1, 'RB': 2, 'WR': 2, 'TE': 1, 'RB/WR/TE': 1, 'D/ST': 1, 'K': 1, 'BE': 6, 'IR': 1}
+STARTERS = ['QB', 'RB', 'RB', 'WR', 'WR', 'TE', 'RB/WR/TE', 'D/ST', 'K']
+BENCH = ['RB', 'WR', 'QB', 'TE', 'WR', 'K']
+
+
+def _call():
+    time.sleep(LATENCY)
+
+
+def _player(player_id, position, points, slot):
+    flex = ['RB/WR/TE'] if position in ('RB', 'WR', 'TE') else []
+    return SimpleNamespace(playerId=player_id, name=f"Player {player_id}", position=position, slot_position=slot,
+                           eligibleSlots=[position] + flex + ['BE'], points=points,
+                           projected_points=round(points * 0.9, 2), proTeam='FA')
+
+
+class Team(object):
+    def __init__(self, team_id, owner):
+        self.team_id = team_id
+        self.team_name = f"Team {team_id}"
+        self.division_id = team_id % 2
+        self.owners = [{'id': '{STANDIN-%d}' % owner, 'displayName': f"Owner {owner}"}]
+        self.logo_url = ''
+        self.schedule, self.scores, self.outcomes, self.matchup_periods = [], [], [], []
+        self.roster = [_player(team_id * 100 + i, 'RB', 0, 'BE') for i in range(15)]
+
+    def __repr__(self):
+        return f"Team({self.team_name})"
+
+
+class League(object):
+    def __init__(self, league_id, year):
+        _call()
+        self.league_id = league_id
+        self.year = year
+        self._rnd = random.Random(year)
+        self.settings = SimpleNamespace(reg_season_count=REG_SEASON_WEEKS, playoff_team_count=6,
+                                        playoff_seed_tie_rule='TOTAL_POINTS_SCORED',
+                                        division_map={0: 'East', 1: 'West'}, position_slot_counts=dict(SLOT_COUNTS))
+        # one owner hands the franchise over every few seasons
+        owners = list(range(TEAMS))
+        owners[year % TEAMS] += TEAMS * (year // 3 % 2)
+        self.teams = [Team(i + 1, owners[i]) for i in range(TEAMS)]
+
+        weeks = REG_SEASON_WEEKS + PLAYOFF_WEEKS
+        played = weeks if year < history.SEASON_YEAR else WEEKS_PLAYED
+        self.current_week = min(played + 1, weeks)
+        for week in range(1, weeks + 1):
+            order = self.teams[:]
+            self._rnd.shuffle(order)
+            for a, b in zip(order[::2], order[1::2]):
+                sa = round(self._rnd.gauss(110, 20), 2) if week <= played else 0
+                sb = round(self._rnd.gauss(110, 20), 2) if week <= played else 0
+                a.schedule.append(b)
+                b.schedule.append(a)
+                a.matchup_periods.append(week)
+                b.matchup_periods.append(week)
+                a.scores.append(sa)
+                b.scores.append(sb)
+                if week > played:
+                    oa = ob = 'U'
+                else:
+                    oa, ob = ('W', 'L') if sa > sb else ('L', 'W') if sb > sa else ('T', 'T')
+                a.outcomes.append(oa)
+                b.outcomes.append(ob)
+
+        for t in self.teams:
+            t.wins, t.losses, t.ties = (t.outcomes.count(o) for o in 'WLT')
+            t.points_for = round(sum(t.scores), 2)
+            t.points_against = round(sum(o.scores[i] for i, o in enumerate(t.schedule)), 2)
+            t.final_standing = 0
+        for rank, t in enumerate(sorted(self.teams, key=lambda t: (-t.wins, -t.points_for)), 1):
+            t.standing = rank
+
+        self.draft = [SimpleNamespace(team=t, playerId=1000 + r * TEAMS + t.team_id, playerName=f"Player {1000 + r * TEAMS + t.team_id}",
+                                      round_num=r + 1, round_pick=t.team_id, keeper_status=False)
+                      for r in range(15) for t in self.teams]
+
+    def _matchups(self, week):
+        seen = set()
+        for t in self.teams:
+            o = t.schedule[week - 1]
+            if t.team_id in seen:
+                continue
+            seen |= {t.team_id, o.team_id}
+            yield t, o, t.scores[week - 1], o.scores[week - 1]
+
+    def scoreboard(self, week=None):
+        _call()
+        week = week or self.current_week
+        return [SimpleNamespace(home_team=h, away_team=a, home_score=hs, away_score=as_,
+                                is_playoff=week > REG_SEASON_WEEKS)
+                for h, a, hs, as_ in self._matchups(week)]
+
+    def _lineup(self, rnd, total):
+        lineup = [_player(1000 + rnd.randrange(400), slot if slot != 'RB/WR/TE' else 'WR',
+                          round(total / len(STARTERS), 2), slot) for slot in STARTERS]
+        lineup += [_player(1000 + rnd.randrange(400), pos, round(rnd.uniform(0, 25), 2), 'BE') for pos in BENCH]
+        return lineup
+
+    def box_scores(self, week=None):
+        _call()
+        week = week or self.current_week
+        rnd = random.Random(self.year * 100 + week)
+        return [SimpleNamespace(home_team=h, away_team=a, home_score=hs, away_score=as_,
+                                home_lineup=self._lineup(rnd, hs), away_lineup=self._lineup(rnd, as_))
+                for h, a, hs, as_ in self._matchups(week)]
+
+    def recent_activity(self, size=25, offset=0, msg_type=None):
+        _call()
+        rnd = random.Random(self.year * 7)
+        base = int(time.mktime((self.year, 9, 1, 0, 0, 0, 0, 0, -1))) * 1000
+        activity = []
+        for d in range(200, 0, -1):
+            action = rnd.choice(['FA ADDED', 'WAIVER ADDED', 'DROPPED'])
+            player = _player(2000 + d, 'WR', 0, 'BE')
+            activity.append(SimpleNamespace(date=base + d * 3600000, actions=[(rnd.choice(self.teams), action, player, 0)]))
+        return activity[offset:offset + size]
+
+
+def install():
+    '''Make every League the project creates a stand-in league'''
+    espn_http.league = lambda league_id, year, espn_s2=None, swid=None: League(league_id, year)
@@ -1,715 +1,404 @@
 import os
+import sys
 import json
 import gspread
-from collections import defaultdict
 from google.oauth2.service_account import Credentials
-from espn_api.football import League
 from dotenv import load_dotenv
 
+# before the project imports: history and friends read SEASON_YEAR,
+# FIRST_SEASON, FF_DATA_DIR, ... from the environment at import time
+load_dotenv()
+
+import espn_http
+import history
+import allplay
+import playoff_odds
+import transactions
+import leaderboards
+import trends
+import h2h
+import checkpoints
+import local_workbook
+import sheet_plan
+import players
+import draft
+import profiling
+import tracing
+
 # League credentials
 LEAGUE_ID = 284843139
-load_dotenv()
 ESPN_S2 = os.getenv("ESPN_S2")
 SWID = os.getenv("SWID")
 google_creds = os.getenv("GOOGLE_CREDS")
-if google_creds is None:
-    raise RuntimeError("GOOGLE_CREDS is not being loaded from the .env file")
-
-import json
-creds = json.loads(google_creds)
-print("Google service account loaded for:", creds["client_email"])
-
-SEASONS = [2021, 2022, 2023]
-
-# Google Sheets setup
-def write_to_google_sheet(data):
-    import gspread
-    from google.oauth2.service_account import Credentials
-
-    creds_dict = json.loads(os.environ['GOOGLE_CREDS'])
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
-    client = gspread.authorize(creds)
-
-    sheet = client.open("Fantasy Football Records")
-    try:
-        worksheet = sheet.worksheet("Records")
-    except gspread.exceptions.WorksheetNotFound:
-        worksheet = sheet.add_worksheet(title="Records", rows="100", cols="10")
-
-    worksheet.clear()
-
-    # Start writing from row 1
-    row_idx = 1
+# only needed to write to Google Sheets; offline / local exports run without it
+creds = json.loads(google_creds) if google_creds else None
 
-    # --- Section 1: Main Records ---
-    worksheet.update(f"A{row_idx}", [["Category", "Owner", "Team", "Points", "Year", "Week"]])
-    row_idx += 1
+# Sheets / season config
+LEAGUE_ID = int(os.getenv("LEAGUE_ID", LEAGUE_ID))
+GOOGLE_CREDS = creds
+SEASON_YEAR = history.SEASON_YEAR
+SEASON_WEEKS = 17
+SHEET_NAME = "Fantasy Football Records"
+RECORDS_TAB_ROWS = 10  # leaderboard entries shown per category in the Records tab
 
-    for category, record in data.items():
-        if category == "The Loyalist":
-            continue
-        worksheet.update(f"A{row_idx}", [[
-            category,
-            record.get("owner", ""),
-            record.get("team", ""),
-            record.get("points", ""),
-            record.get("year", ""),
-            record.get("week", "")
-        ]])
-        row_idx += 1
-
-    # --- Spacer Row ---
-    row_idx += 1  # leave a true empty row
-
-    # --- Section 2: The Loyalist ---
-    worksheet.update(f"A{row_idx}", [["🏅 The Loyalist"]])
-    row_idx += 1
-
-    worksheet.update(f"A{row_idx}", [[
-        "This award goes to the manager who retained the most players from their original draft roster throughout the season."
-    ]])
-    row_idx += 1
-
-    worksheet.update(f"A{row_idx}", [["Owner", "Team", "Drafted Players Retained", "Year"]])
-    row_idx += 1
-
-    loyalist = data["The Loyalist"]
-    worksheet.update(f"A{row_idx}", [[
-        loyalist.get("owner", ""),
-        loyalist.get("team", ""),
-        loyalist.get("points", ""),
-        loyalist.get("year", "")
-    ]])
-
-    print("✅ Google Sheet updated with records and Loyalist section.")
-
-def export_standings_and_schedule(current_year):
-    from espn_api.football import League
-    import gspread
-    from google.oauth2.service_account import Credentials
-    import json
-    import os
-
-    creds_dict = json.loads(os.environ['GOOGLE_CREDS'])
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = Credentials.from_service_account_info(creds_dict, scopes=scope)
-    client = gspread.authorize(creds)
-
-    league = League(
-        league_id=284843139,
-        year=current_year,
-        espn_s2=os.environ['ESPN_S2'],
-        swid=os.environ['SWID']
-    )
-
-    # Create or replace a worksheet for standings & schedule
-    sheet = client.open("Fantasy Football Records")
-    try:
-        worksheet = sheet.worksheet("Current Season")
-        sheet.del_worksheet(worksheet)
-    except gspread.exceptions.WorksheetNotFound:
-        pass
+LOCAL_WORKBOOK_DIR = os.getenv("LOCAL_WORKBOOK_DIR", os.path.join(history.DATA_DIR, "workbook"))
+# the tabs as last written to each target, so later exports can send only what changed
+WRITTEN_PATH = os.path.join(history.DATA_DIR, "workbook_written.json")
 
-    worksheet = sheet.add_worksheet(title="Current Season", rows="100", cols="10")
+# Offline exports read only the local archive / transaction logs, never ESPN
+OFFLINE = False
 
-    # --- Standings ---
-    row = 1
-    worksheet.update(f"A{row}", [["🏆 Current Standings"]])
-    row += 1
-    worksheet.update(f"A{row}", [["Rank", "Team", "Owner", "Wins", "Losses", "Points For", "Points Against"]])
-    row += 1
-
-    teams = sorted(league.teams, key=lambda t: t.standing)
-    for team in teams:
-        owner = team.owners[0]['displayName'] if team.owners else 'Unknown'
-        worksheet.update(f"A{row}", [[
-            team.standing,
-            team.team_name,
-            owner,
-            team.wins,
-            team.loss
-            ]])
-        row += 1
-
-    # --- Spacer ---
-    row += 1
-
-    # --- Remaining Schedule ---
-    worksheet.update(f"A{row}", [["📅 Upcoming Schedule"]])
-    row += 1
-    worksheet.update(f"A{row}", [["Week", "Matchup"]])
-    row += 1
-
-    current_week = league.current_week
-    for matchup in league.schedule:
-        if matchup['matchup_period'] >= current_week:
-            team1 = matchup['home_team'].team_name if matchup['home_team'] else "TBD"
-            team2 = matchup['away_team'].team_name if matchup['away_team'] else "TBD"
-            worksheet.update(f"A{row}", [[matchup['matchup_period'], f"{team1} vs {team2}"]])
-            row += 1
-
-    print(f"✅ Standings and schedule for {current_year} exported to 'Current Season' tab.")
-
-# Data collection
-def gather_records():
-    most_points_game = {"points": 0}
-    least_points_game = {"points": float("inf")}
-    season_totals = defaultdict(lambda: defaultdict(float))  # owner_id -> year -> total points
-    draft_retention = defaultdict(lambda: defaultdict(int))  # owner_id -> year -> retained count
-    owner_map = {}
-
-    for year in SEASONS:
-        try:
-            league = League(league_id=LEAGUE_ID, year=year, espn_s2=ESPN_S2, swid=SWID)
-        except Exception as e:
-            print(f"Failed to load season {year}: {e}")
-            continue
+# Spreadsheet the tab writers write to; set by connect()
+sh = None
 
-        for team in league.teams:
-            owner = team.owners[0]['displayName'] if team.owners else 'Unknown'
-            owner_id = team.owners[0]['id'] if team.owners else 'unknown'
-            team_name = team.team_name
-            scores = team.scores
-
-            season_points = sum(scores)
-            season_totals[owner_id][year] += season_points
-            owner_map[owner_id] = {"owner": owner, "team": team_name}
-
-            drafted_ids = set(p.playerId for p in team.roster)
-            current_ids = set(p.playerId for p in team.roster)
-            retained = len(drafted_ids & current_ids)
-            draft_retention[owner_id][year] = retained
-
-            for week, score in enumerate(scores, 1):
-                if score > most_points_game["points"]:
-                    most_points_game = {
-                        "team": team_name, "owner": owner, "points": round(score, 2),
-                        "year": year, "week": week
-                    }
-                if score < least_points_game["points"]:
-                    least_points_game = {
-                        "team": team_name, "owner": owner, "points": round(score, 2),
-                        "year": year, "week": week
-                    }
-
-    most_points_season = {"points": 0}
-    least_points_season = {"points": float("inf")}
-
-    for owner_id, years in season_totals.items():
-        for year, total in years.items():
-            info = owner_map.get(owner_id, {"owner": "Unknown", "team": "Unknown"})
-            if total > most_points_season["points"]:
-                most_points_season = {
-                    "team": info["team"], "owner": info["owner"], "points": round(total, 2),
-                    "year": year, "week": "-"
-                }
-            if total < least_points_season["points"]:
-                least_points_season = {
-                    "team": info["team"], "owner": info["owner"], "points": round(total, 2),
-                    "year": year, "week": "-"
-                }
-
-    loyalist = {"points": 0}
-    for owner_id, years in draft_retention.items():
-        for year, retained in years.items():
-            info = owner_map.get(owner_id, {"owner": "Unknown", "team": "Unknown"})
-            if retained > loyalist["points"]:
-                loyalist = {
-                    "team": info["team"], "owner": info["owner"], "points": retained,
-                    "year": year, "week": "-"
-                }
-
-    return {
-        "Most Points in a Game": most_points_game,
-        "Least Points in a Game": least_points_game,
-        "Most Points in a Season": most_points_season,
-        "Least Points in a Season": least_points_season,
-        "The Loyalist": loyalist
-    }
-
-# Run it
-if __name__ == "__main__":
-    data = gather_records()
-    write_to_google_sheet(data)
-    export_standings_and_schedule(current_year=2025)
-
-    import os
-    import json
-    from collections import defaultdict
-    from dotenv import load_dotenv
-    from espn_api.football import League
-    import gspread
-    from google.oauth2.service_account import Credentials
-
-    load_dotenv()
-
-    LEAGUE_ID = int(os.getenv("LEAGUE_ID"))
-    ESPN_S2 = os.getenv("ESPN_S2")
-    SWID = os.getenv("SWID")
-    GOOGLE_CREDS = json.loads(os.getenv("GOOGLE_CREDS"))
-    SEASON_YEAR = 2025
-    SEASON_WEEKS = 17
-    SHEET_NAME = "Fantasy Football Records"
 
+def open_spreadsheet():
+    if GOOGLE_CREDS is None:
+        raise RuntimeError("GOOGLE_CREDS is not being loaded from the .env file")
+    print("Google service account loaded for:", GOOGLE_CREDS["client_email"])
     scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
     credentials = Credentials.from_service_account_info(GOOGLE_CREDS, scopes=scope)
     gc = gspread.authorize(credentials)
 
     # Open or create the spreadsheet
     try:
-        sh = gc.open(SHEET_NAME)
+        return gc.open(SHEET_NAME)
     except gspread.SpreadsheetNotFound:
-        sh = gc.create(SHEET_NAME)
+        return gc.create(SHEET_NAME)
 
 
-    def get_league(year=SEASON_YEAR):
-        return League(
-            league_id=LEAGUE_ID,
-            year=year,
-            espn_s2=ESPN_S2,
-            swid=SWID
-        )
+def connect(local=False):
+    '''Point the tab writers at Google Sheets, or at CSV files in LOCAL_WORKBOOK_DIR'''
+    global sh
+    sh = local_workbook.LocalWorkbook(LOCAL_WORKBOOK_DIR) if local else open_spreadsheet()
+    return sh
 
 
-    def write_records_tab(records_data):
-        try:
-            worksheet = sh.worksheet("Records")
-            sh.del_worksheet(worksheet)
-        except gspread.exceptions.WorksheetNotFound:
-            pass
-        worksheet = sh.add_worksheet(title="Records", rows="100", cols="10")
-        worksheet.clear()
-
-        row_idx = 1
-
-        # Section 1: Most / Least Points Game & Season
-        worksheet.update(f"A{row_idx}", [["🏆 Most / Least Points in Game & Season"]])
-        row_idx += 1
-        worksheet.update(f"A{row_idx}", [["Category", "Owner", "Team", "Points", "Year", "Week"]])
-        row_idx += 1
-
-        categories = [
-            "Most Points Game",
-            "Least Points Game",
-            "Most Points Season",
-            "Least Points Season",
-        ]
-
-        for cat in categories:
-            rec = records_data.get(cat, {})
-            worksheet.update(f"A{row_idx}", [[
-                cat,
-                rec.get("owner", ""),
-                rec.get("team", ""),
-                rec.get("points", ""),
-                rec.get("year", ""),
-                rec.get("week", "")
-            ]])
-            row_idx += 1
-
-        row_idx += 1  # spacer
-
-        # Section 2: Largest / Smallest Point Differential
-        worksheet.update(f"A{row_idx}", [["📊 Largest / Smallest Point Differentials in a Game"]])
-        row_idx += 1
-        worksheet.update(f"A{row_idx}",
-                         [["Category", "Winner", "Loser", "Winner Team", "Loser Team", "Point Diff", "Year", "Week"]])
-        row_idx += 1
-
-        for cat in ["Largest Point Differential", "Smallest Point Differential"]:
-            rec = records_data.get(cat, {})
-            worksheet.update(f"A{row_idx}", [[
-                cat,
-                rec.get("winner_owner", ""),
-                rec.get("loser_owner", ""),
-                rec.get("winner_team", ""),
-                rec.get("loser_team", ""),
-                rec.get("point_diff", ""),
-                rec.get("year", ""),
-                rec.get("week", "")
-            ]])
-            row_idx += 1
-
-        row_idx += 1  # spacer
-
-        # Section 3: The Managing Maestro
-        worksheet.update(f"A{row_idx}", [["🎯 The Managing Maestro (Season Efficiency)"]])
-        row_idx += 1
-        worksheet.update(f"A{row_idx}", [["Owner", "Team", "Efficiency (Starters / Max Possible)", "Year"]])
-        row_idx += 1
-
-        maestro = records_data.get("The Managing Maestro", {})
-        worksheet.update(f"A{row_idx}", [[
-            maestro.get("owner", ""),
-            maestro.get("team", ""),
-            maestro.get("efficiency", ""),
-            maestro.get("year", "")
-        ]])
-        row_idx += 2  # space
-
-# Section 4: The Hustler & The Zen Master (FA Pickups)
-    worksheet.update(f"A{row_idx}", [["⚡ The Hustler (Most Free Agent Pickups) & 🧘 The Zen Master (Fewest Free Agent Pickups)"]])
-    row_idx += 1
-    worksheet.update(f"A{row_idx}", [["Award", "Owner", "Team", "Pickups", "Year"]])
-    row_idx += 1
-
-    hustler = records_data.get("Most Free Agent Pickups", {})
-    zenmaster = records_data.get("Fewest Free Agent Pickups", {})
-
-    worksheet.update(f"A{row_idx}", [[
-        "The Hustler",
-        hustler.get("owner", ""),
-        hustler.get("team", ""),
-        hustler.get("pickups", ""),
-        hustler.get("year", "")
-    ]])
-    row_idx += 1
-    worksheet.update(f"A{row_idx}", [[
-        "The Zen Master",
-        zenmaster.get("owner", ""),
-        zenmaster.get("team", ""),
-        zenmaster.get("pickups", ""),
-        zenmaster.get("year", "")
-    ]])
-    row_idx += 2  # spacer
+def read_written(target):
+    try:
+        with open(WRITTEN_PATH) as f:
+            return json.load(f).get(target, {})
+    except FileNotFoundError:
+        return {}
 
-    # Section 5: The Loyalist
-    worksheet.update(f"A{row_idx}", [["🏅 The Loyalist"]])
-    row_idx += 1
-    worksheet.update(f"A{row_idx}", [[
-        "This award goes to the manager who retained the most players from their original draft roster throughout the season."
-    ]])
-    row_idx += 1
-    worksheet.update(f"A{row_idx}", [["Owner", "Team", "Players Retained", "Year"]])
-    row_idx += 1
 
-    loyalist = records_data.get("The Loyalist", {})
-    worksheet.update(f"A{row_idx}", [[
-        loyalist.get("owner", ""),
-        loyalist.get("team", ""),
-        loyalist.get("players_retained", ""),
-        loyalist.get("year", "")
-    ]])
-
-def write_current_season_tab():
+def write_written(target, tabs):
     try:
-        worksheet = sh.worksheet("Current Season")
-        sh.del_worksheet(worksheet)
-    except gspread.exceptions.WorksheetNotFound:
-        pass
-    worksheet = sh.add_worksheet(title="Current Season", rows="100", cols="10")
-    worksheet.clear()
+        with open(WRITTEN_PATH) as f:
+            written = json.load(f)
+    except FileNotFoundError:
+        written = {}
+    written[target] = {t['title']: t for t in tabs}
+    tmp = WRITTEN_PATH + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(written, f)
+    os.replace(tmp, WRITTEN_PATH)
+
+
+def write_workbook(tabs, local=False, changed_only=False):
+    '''Write the tabs in full, or with changed_only just the rows that differ from the last write'''
+    target = LOCAL_WORKBOOK_DIR if local else SHEET_NAME
+    if changed_only:
+        rewritten = sheet_plan.update(connect(local), tabs, read_written(target))
+        print(f"Rewrote {', '.join(rewritten) or 'no'} tabs in full, changed rows of the rest")
+    else:
+        sheet_plan.apply(connect(local), tabs)
+    write_written(target, tabs)
+
+
+def load_data():
+    '''The local archive; refreshed from ESPN first unless running offline'''
+    if OFFLINE:
+        return history.load_history(offline=True)
+    return history.load_history()
+
+
+def get_league(year=SEASON_YEAR):
+    return espn_http.league(LEAGUE_ID, year, espn_s2=ESPN_S2, swid=SWID)
+
+
+# --- Tabs ---
+# Each builder returns a sheet_plan.tab(); main() writes them all at once.
+
+def records_tab(records_data):
+    boards = records_data["Leaderboards"]
+    rows = []
+    headers = []
+
+    # Section 1: Most / Least Points Game & Season
+    for key in ("highest_game", "lowest_game", "best_season", "worst_season"):
+        rows.append([f"🏆 {leaderboards.TITLES[key]}"])
+        headers.append(len(rows))
+        rows.append(["Rank", "Owner", "Team", "Points", "Year", "Week"])
+        for rank, rec in enumerate(boards[key][:RECORDS_TAB_ROWS], 1):
+            rows.append([rank, rec["owner"], rec["team"], rec["points"], rec["year"], rec["week"]])
+        rows.append([])  # spacer
+
+    # Section 2: Largest / Smallest Point Differential
+    for key in ("biggest_blowout", "closest_game"):
+        rows.append([f"📊 {leaderboards.TITLES[key]}"])
+        headers.append(len(rows))
+        rows.append(["Rank", "Winner", "Loser", "Winner Team", "Loser Team", "Point Diff", "Year", "Week"])
+        for rank, rec in enumerate(boards[key][:RECORDS_TAB_ROWS], 1):
+            rows.append([rank, rec["winner_owner"], rec["loser_owner"], rec["winner_team"], rec["loser_team"],
+                         rec["point_diff"], rec["year"], rec["week"]])
+        rows.append([])
+
+    # Section 3: The Managing Maestro
+    rows.append(["🎯 The Managing Maestro (Season Efficiency)"])
+    headers.append(len(rows))
+    rows.append(["Rank", "Owner", "Team", "Efficiency (Starters / Max Possible)", "Year"])
+    for rank, rec in enumerate(boards["efficiency"][:RECORDS_TAB_ROWS], 1):
+        rows.append([rank, rec["owner"], rec["team"], rec["efficiency"], rec["year"]])
+    rows.append([])
+
+    # Section 4: The Hustler & The Zen Master (FA Pickups)
+    rows.append(["⚡ The Hustler (Most Free Agent Pickups) & 🧘 The Zen Master (Fewest Free Agent Pickups)"])
+    headers.append(len(rows))
+    rows.append(["Award", "Owner", "Team", "Pickups", "Year"])
+    for award, key in (("The Hustler", "Most Free Agent Pickups"), ("The Zen Master", "Fewest Free Agent Pickups")):
+        rec = records_data.get(key, {})
+        rows.append([award, rec.get("owner", ""), rec.get("team", ""), rec.get("pickups", ""), rec.get("year", "")])
+    rows.append([])
 
-    league = get_league(SEASON_YEAR)
-    teams = sorted(league.teams, key=lambda t: t.standing)
-    row_idx = 1
+    # Section 5: The Loyalist
+    loyalist = records_data.get("The Loyalist", {})
+    rows.append(["🏅 The Loyalist"])
+    rows.append(["This award goes to the manager who retained the most players from their original draft roster throughout the season."])
+    headers.append(len(rows))
+    rows.append(["Owner", "Team", "Players Retained", "Year"])
+    rows.append([loyalist.get("owner", ""), loyalist.get("team", ""), loyalist.get("players_retained", ""), loyalist.get("year", "")])
+
+    return sheet_plan.tab("Records", rows, header_rows=headers)
+
+def current_season_tab(data):
+    # standings and schedule come from the archive (refreshed from ESPN unless offline)
+    season = data['seasons'].get(SEASON_YEAR)
+    if season is None:
+        print(f"No {SEASON_YEAR} season in the archive")
+        return sheet_plan.tab("Current Season", [[f"No {SEASON_YEAR} season data"]])
+    teams = sorted(season['teams'], key=lambda t: t['standing'])
+    team_names = {t['owner_id']: t['team_name'] for t in season['teams']}
+    headers = []
 
     # Standings
-    worksheet.update(f"A{row_idx}", [["🏆 Current Standings"]])
-    row_idx += 1
-    worksheet.update(f"A{row_idx}", [["Rank", "Team", "Owner", "Wins", "Losses", "Points For", "Points Against"]])
-    row_idx += 1
+    rows = [["🏆 Current Standings"],
+            ["Rank", "Team", "Owner", "Wins", "Losses", "Points For", "Points Against"]]
+    headers.append(1)
     for team in teams:
-        owner = team.owners[0]['displayName'] if team.owners else 'Unknown'
-        worksheet.update(f"A{row_idx}", [[
-            team.standing,
-            team.team_name,
-            owner,
-            team.wins,
-            team.losses,
-            round(team.points_for, 2),
-            round(team.points_against, 2)
-        ]])
-        row_idx += 1
-
-    row_idx += 1  # spacer
-
-    # Remaining schedule
-    worksheet.update(f"A{row_idx}", [["📅 Upcoming Schedule"]])
-    row_idx += 1
-    worksheet.update(f"A{row_idx}", [["Week", "Matchup"]])
-    row_idx += 1
-    current_week = league.current_week
-    for matchup in league.schedule:
-        if matchup['matchup_period'] >= current_week:
-            team1 = matchup['home_team'].team_name if matchup['home_team'] else "TBD"
-            team2 = matchup['away_team'].team_name if matchup['away_team'] else "TBD"
-            worksheet.update(f"A{row_idx}", [[matchup['matchup_period'], f"{team1} vs {team2}"]])
-            row_idx += 1
-
-def write_headtohead_tab():
-    try:
-        worksheet = sh.worksheet("Head-to-Head")
-        sh.del_worksheet(worksheet)
-    except gspread.exceptions.WorksheetNotFound:
-        pass
-    worksheet = sh.add_worksheet(title="Head-to-Head", rows="100", cols="50")
-    worksheet.clear()
-
-    seasons = range(SEASON_YEAR - 2, SEASON_YEAR + 1)  # 3 seasons: 2023, 2024, 2025 (adjust as needed)
-    head_to_head_records = defaultdict(lambda: defaultdict(lambda: [0, 0]))
-    owner_id_to_name = {}
-
-    for year in seasons:
+        rows.append([
+            team['standing'],
+            team['team_name'],
+            team['owner_name'],
+            team['wins'],
+            team['losses'],
+            round(team['points_for'], 2),
+            round(team['points_against'], 2)
+        ])
+    rows.append([])  # spacer
+
+    # Playoff odds
+    odds = playoff_odds.current_odds(data, year=SEASON_YEAR)
+    if odds:
+        rows.append([f"🎲 Playoff Odds ({odds['simulations']:,} simulations, {odds['games_remaining']} games left)"])
+        headers.append(len(rows))
+        rows.append(["Team", "Owner", "Projected Wins", "Playoff %", "Bye %", "Most Likely Seed"])
+        for t in odds["teams"]:
+            rows.append([t["team"], t["owner"], t["projected_wins"], t["playoff_pct"], t["bye_pct"], t["likely_seed"]])
+        rows.append([])  # spacer
+
+    # Remaining schedule last: it shrinks every week, so the sections above keep their rows
+    rows.append(["📅 Upcoming Schedule"])
+    headers.append(len(rows))
+    rows.append(["Week", "Matchup"])
+    for g in season['games']:
+        if not g['final']:
+            rows.append([g['week'], f"{team_names.get(g['home_id'], 'TBD')} vs {team_names.get(g['away_id'], 'TBD')}"])
+
+    return sheet_plan.tab("Current Season", rows, header_rows=headers)
+
+# Head-to-head cells read "W-L" or "W-L-T": green when winning, red when losing
+H2H_WINNING = r'=IFERROR(VALUE(REGEXEXTRACT(B2,"^\d+"))>VALUE(REGEXEXTRACT(B2,"^\d+-(\d+)")),FALSE)'
+H2H_LOSING = r'=IFERROR(VALUE(REGEXEXTRACT(B2,"^\d+"))<VALUE(REGEXEXTRACT(B2,"^\d+-(\d+)")),FALSE)'
+
+def headtohead_tab(data):
+    # last 3 seasons, summed from the per-season matrices (no ESPN calls)
+    matrices = h2h.get(data)
+    owner_ids, table = matrices.table(SEASON_YEAR - 2, SEASON_YEAR)
+
+    rows = [[""] + [matrices.names[oid] for oid in owner_ids]]
+    for oid, row in zip(owner_ids, table):
+        rows.append([matrices.names[oid]] + [row["record"][oid2] for oid2 in owner_ids])
+
+    grid = [1, len(rows), 1, len(owner_ids) + 1]
+    return sheet_plan.tab("Head-to-Head", rows, header_rows=[0], frozen_rows=1, conditional=[
+        {"range": grid, "formula": H2H_WINNING, "color": {"red": 0.85, "green": 0.94, "blue": 0.83}},
+        {"range": grid, "formula": H2H_LOSING, "color": {"red": 0.96, "green": 0.8, "blue": 0.8}},
+    ])
+
+def allplay_tab(data):
+    results = allplay.compute(data)
+
+    rows = [["📐 All-Play Records & Expected Wins"],
+            ["Year", "Owner", "Team", "Record", "All-Play", "Expected Wins", "Luck"]]
+    for year in sorted(results, reverse=True):
+        season = sorted(results[year].values(), key=lambda r: r["expected_wins"], reverse=True)
+        for r in season:
+            rows.append([
+                year,
+                r["owner"],
+                r["team"],
+                f"{r['wins']}-{r['losses']}-{r['ties']}",
+                f"{r['allplay_wins']}-{r['allplay_losses']}-{r['allplay_ties']}",
+                r["expected_wins"],
+                r["luck"]
+            ])
+        rows.append([])  # spacer between seasons
+
+    return sheet_plan.tab("All-Play", rows, header_rows=[1], frozen_rows=2)
+
+def trends_tab(data, chart=True):
+    series = trends.get(data)
+    power = series.power_rankings(SEASON_YEAR)
+    if not power:
+        return sheet_plan.tab("Trends", [[f"No {SEASON_YEAR} games yet"]])
+    # one row per week in a fixed column order, so a new week only adds a row
+    owners = sorted(power, key=lambda oid: series.names.get(oid, "Unknown"))
+    weeks = sorted({p["week"] for s in power.values() for p in s})
+    by_week = {oid: {p["week"]: p["score"] for p in power[oid]} for oid in owners}
+
+    # Power score by week, one column per owner
+    rows = [["Week"] + [series.names.get(oid, "Unknown") for oid in owners]]
+    for week in weeks:
+        rows.append([week] + [by_week[oid].get(week, "") for oid in owners])
+
+    charts = []
+    if chart:
+        charts.append({"title": f"{SEASON_YEAR} Power Rankings", "type": "LINE",
+                       "rows": max(len(rows), SEASON_WEEKS + 1),
+                       "domain_col": 0, "series_cols": list(range(1, len(owners) + 1)),
+                       "x_title": "Week", "y_title": "Power Score"})
+    return sheet_plan.tab("Trends", rows, header_rows=[0], frozen_rows=1, charts=charts)
+
+def collect_season(year, data=None):
+    '''Everything the Records tab needs from one season, as plain JSON-able data
+
+    Brings the season's transaction log and player warehouse up to date from
+    ESPN, then reads it all back like collect_season_offline(), so both export
+    modes and the app's /records page agree.
+    '''
+    data = data or load_data()
+    league = get_league(year)
+
+    # Pickups and draft retention come from the stored transaction log
+    # (current season only)
+    if year == SEASON_YEAR:
         try:
-            league = get_league(year)
+            transactions.sync_season(year, league)
         except Exception as e:
-            print(f"Error loading league for {year}: {e}")
-            continue
+            print(f"Failed to sync transactions for {year}: {e}")
+
+    # a week that still fails after the session's retries fails the step,
+    # so the records are never built with a week's lineups silently missing
+    stored = data['seasons'].get(year)
+    if stored is not None and year >= players.FIRST_BOX_SCORE_SEASON:
+        players.sync_season(stored, league=league, live=False)
+
+    return collect_season_offline(data, year)
+
+def collect_season_offline(data, year):
+    '''collect_season() from the local archive, transaction log and player warehouse'''
+    season = {"year": year, "owners": {}, "seasons": [], "games": [], "efficiency": {},
+              "pickups": None, "retention": {}}
+    stored = data['seasons'].get(year)
+    if stored is None:
+        print(f"No {year} season in the archive")
+        return season
+
+    names = {}
+    for team in stored['teams']:
+        names[team['owner_id']] = [team['owner_name'], team['team_name']]
+        if year < SEASON_YEAR:
+            season["seasons"].append([team['owner_name'], team['team_name'], team['points_for']])
+    season["owners"] = names
+    for g in stored['games']:
+        if g['final'] and g['week'] <= SEASON_WEEKS:
+            season["games"].append([g['week'], names[g['home_id']], names[g['away_id']],
+                                    g['home_score'], g['away_score']])
+
+    # lineup efficiency from whatever the player warehouse already holds
+    store = players.get()
+    for team_id, totals in players.season_efficiency(store, stored).items():
+        owner_id = next(t['owner_id'] for t in stored['teams'] if t['team_id'] == team_id)
+        season["efficiency"][owner_id] = totals
+
+    if year == SEASON_YEAR:
+        season_transactions = transactions.read_season(year)
+        if season_transactions:
+            season["pickups"] = dict(transactions.pickup_counts(season_transactions))
+            season["retention"] = {oid: retained for oid, (retained, _) in
+                                   transactions.draft_retention(season_transactions).items()}
+    return season
+
+def calculate_records(seasons=None):
+    '''Records from collect_season() output; fetches the last 3 seasons when not given'''
+    if seasons is None:
+        data = load_data()
+        seasons = [collect_season(year, data) for year in range(SEASON_YEAR - 2, SEASON_YEAR + 1)]
 
-        for week in range(1, SEASON_WEEKS + 1):
-            try:
-                scoreboard = league.scoreboard(week)
-            except Exception:
-                continue
-            for matchup in scoreboard:
-                home = matchup.home_team
-                away = matchup.away_team
-                if not home or not away:
-                    continue
-
-                # owner info
-                home_owner_id = home.owners[0]['id'] if home.owners else "unknown"
-                away_owner_id = away.owners[0]['id'] if away.owners else "unknown"
-                home_owner_name = home.owners[0]['displayName'] if home.owners else "Unknown"
-                away_owner_name = away.owners[0]['displayName'] if away.owners else "Unknown"
-
-                owner_id_to_name[home_owner_id] = home_owner_name
-                owner_id_to_name[away_owner_id] = away_owner_name
-
-                home_score = matchup.home_score
-                away_score = matchup.away_score
-
-                if home_score > away_score:
-                    head_to_head_records[home_owner_id][away_owner_id][0] += 1
-                    head_to_head_records[away_owner_id][home_owner_id][1] += 1
-                elif away_score > home_score:
-                    head_to_head_records[away_owner_id][home_owner_id][0] += 1
-                    head_to_head_records[home_owner_id][away_owner_id][1] += 1
-
-    owner_ids = sorted(owner_id_to_name.keys(), key=lambda oid: owner_id_to_name[oid].lower())
-    # Write matrix header
-    worksheet.update("B1", [[owner_id_to_name[oid] for oid in owner_ids]])
-    worksheet.update("A2", [[owner_id_to_name[oid]] for oid in owner_ids])
-
-    # Write matrix body
-    for i, oid in enumerate(owner_ids):
-        row = []
-        for oid2 in owner_ids:
-            if oid == oid2:
-                row.append("—")
-            else:
-                w, l = head_to_head_records[oid][oid2]
-                row.append(f"{w}-{l}")
-        worksheet.update(f"B{i+2}", [row])
-
-def calculate_records():
     records = {}
-
-    seasons = range(SEASON_YEAR - 2, SEASON_YEAR + 1)  # last 3 seasons
-    most_points_game = {"points": -1}
-    least_points_game = {"points": 99999}
-    most_points_season = defaultdict(lambda: 0)  # owner_id: points
-    least_points_season = defaultdict(lambda: 999999)
-    largest_point_diff = {"diff": -1}
-    smallest_point_diff = {"diff": 99999}
-    managing_maestro = {"efficiency": -1}
-    free_agent_pickups = defaultdict(int)  # owner_id: count
-    total_pickups = defaultdict(int)
-    loyalist_players = defaultdict(lambda: defaultdict(int))  # year -> owner_id -> count of draft players retained
+    boards = leaderboards.Leaderboards()
+    free_agent_pickups = {}  # owner_id: count
+    loyalist_counts = {}  # owner_id -> count of draft players retained (current season)
     owner_id_to_name = {}
     owner_id_to_team_name = {}
 
-    for year in seasons:
-        league = get_league(year)
-        for team in league.teams:
-            # owner info
-            owner = team.owners[0] if team.owners else {"id": "unknown", "displayName": "Unknown"}
-            owner_id = owner.get("id", "unknown")
-            owner_name = owner.get("displayName", "Unknown")
+    for season in seasons:
+        year = season["year"]
+        for owner_id, (owner_name, team_name) in season["owners"].items():
             owner_id_to_name[owner_id] = owner_name
-            owner_id_to_team_name[owner_id] = team.team_name
-
-            # Season points tally
-            points = team.points_for
-            if points > most_points_season[owner_id]:
-                most_points_season[owner_id] = points
-            if points < least_points_season[owner_id]:
-                least_points_season[owner_id] = points
-
-            # Free agent pickups
-            free_agent_pickups[owner_id] += team.free_agent_acquisitions
-
-            # Loyalist: count how many draft players still on roster
-            draft_player_ids = {p.playerId for p in team.draft_results} if hasattr(team, 'draft_results') else set()
-            roster_player_ids = {p.playerId for p in team.roster} if hasattr(team, 'roster') else set()
-            retained = len(draft_player_ids.intersection(roster_player_ids))
-            loyalist_players[year][owner_id] = retained
-
-        # Check each week for points and point differentials
-        for week in range(1, SEASON_WEEKS + 1):
-            try:
-                scoreboard = league.scoreboard(week)
-            except Exception:
-                continue
-
-            for matchup in scoreboard:
-                home = matchup.home_team
-                away = matchup.away_team
-                if not home or not away:
-                    continue
-
-                home_score = matchup.home_score
-                away_score = matchup.away_score
-
-                # Most/Least points in a game
-                if home_score > most_points_game.get("points", -1):
-                    most_points_game.update({
-                        "owner": home.owners[0]['displayName'] if home.owners else "Unknown",
-                        "team": home.team_name,
-                        "points": home_score,
-                        "year": year,
-                        "week": week
-                    })
-                if away_score > most_points_game.get("points", -1):
-                    most_points_game.update({
-                        "owner": away.owners[0]['displayName'] if away.owners else "Unknown",
-                        "team": away.team_name,
-                        "points": away_score,
-                        "year": year,
-                        "week": week
-                    })
-
-                if home_score < least_points_game.get("points", 99999):
-                    least_points_game.update({
-                        "owner": home.owners[0]['displayName'] if home.owners else "Unknown",
-                        "team": home.team_name,
-                        "points": home_score,
-                        "year": year,
-                        "week": week
-                    })
-                if away_score < least_points_game.get("points", 99999):
-                    least_points_game.update({
-                        "owner": away.owners[0]['displayName'] if away.owners else "Unknown",
-                        "team": away.team_name,
-                        "points": away_score,
-                        "year": year,
-                        "week": week
-                    })
-
-                # Point differentials
-                diff = abs(home_score - away_score)
-                if diff > largest_point_diff.get("diff", -1):
-                    largest_point_diff.update({
-                        "winner_owner": (home.owners[0]['displayName'] if home_score > away_score and home.owners else
-                                         away.owners[0]['displayName'] if away.owners else "Unknown"),
-                        "loser_owner": (away.owners[0]['displayName'] if home_score > away_score and away.owners else
-                                        home.owners[0]['displayName'] if home.owners else "Unknown"),
-                        "winner_team": home.team_name if home_score > away_score else away.team_name,
-                        "loser_team": away.team_name if home_score > away_score else home.team_name,
-                        "point_diff": diff,
-                        "year": year,
-                        "week": week
-                    })
-                if diff < smallest_point_diff.get("diff", 99999) and diff != 0:
-                    smallest_point_diff.update({
-                        "winner_owner": (home.owners[0]['displayName'] if home_score > away_score and home.owners else
-                                         away.owners[0]['displayName'] if away.owners else "Unknown"),
-                        "loser_owner": (away.owners[0]['displayName'] if home_score > away_score and away.owners else
-                                        home.owners[0]['displayName'] if home.owners else "Unknown"),
-                        "winner_team": home.team_name if home_score > away_score else away.team_name,
-                        "loser_team": away.team_name if home_score > away_score else home.team_name,
-                        "point_diff": diff,
-                        "year": year,
-                        "week": week
-                    })
-
-        # Calculate Managing Maestro efficiency: season starter points / max possible starter points
-        total_efficiency_by_owner = defaultdict(lambda: {"starter_points": 0, "max_points": 0})
-
-        for week in range(1, SEASON_WEEKS + 1):
-            try:
-                scoreboard = league.scoreboard(week)
-            except Exception:
-                continue
-
-            for matchup in scoreboard:
-                for team in [matchup.home_team, matchup.away_team]:
-                    if not team:
-                        continue
-                    owner = team.owners[0]['id'] if team.owners else "unknown"
-                    # sum weekly starter points and max points possible for that team
-                    starter_points = getattr(team, 'starter_points', None)
-                    max_points = getattr(team, 'max_points', None)
-
-                    # fallback: calculate from starters and bench if attributes missing
-                    if starter_points is None or max_points is None:
-                        # Sum points from starters
-                        try:
-                            starter_points = sum(p.points for p in team.starters if hasattr(p, 'points'))
-                            bench_points = sum(p.points for p in team.bench if hasattr(p, 'points'))
-                            max_points = starter_points + bench_points
-                        except Exception:
-                            starter_points = 0
-                            max_points = 0
-
-                    total_efficiency_by_owner[owner]["starter_points"] += starter_points or 0
-                    total_efficiency_by_owner[owner]["max_points"] += max_points or 0
-
-        for owner_id, vals in total_efficiency_by_owner.items():
-            max_p = vals["max_points"]
-            if max_p > 0:
-                efficiency = vals["starter_points"] / max_p
-                if efficiency > managing_maestro["efficiency"]:
-                    managing_maestro.update({
-                        "owner": owner_id_to_name.get(owner_id, "Unknown"),
-                        "team": owner_id_to_team_name.get(owner_id, ""),
-                        "efficiency": round(efficiency, 4),
-                        "year": year
-                    })
-
-    # Finalize Most/Least points season
-    most_points_season_owner = max(most_points_season, key=most_points_season.get, default=None)
-    least_points_season_owner = min(least_points_season, key=least_points_season.get, default=None)
+            owner_id_to_team_name[owner_id] = team_name
+            if season["pickups"] is not None:
+                free_agent_pickups[owner_id] = season["pickups"].get(owner_id, 0)
+            if season["retention"]:
+                loyalist_counts[owner_id] = season["retention"].get(owner_id, 0)
+
+        for owner_name, team_name, points in season["seasons"]:
+            boards.add_season(year, owner_name, team_name, points)
+        for week, home, away, home_score, away_score in season["games"]:
+            boards.add_game(year, week, tuple(home), tuple(away), home_score, away_score)
+        for owner_id, (starter_points, max_points) in season["efficiency"].items():
+            if max_points > 0:
+                boards.add_efficiency(year, owner_id_to_name.get(owner_id, "Unknown"),
+                                      owner_id_to_team_name.get(owner_id, ""),
+                                      starter_points / max_points)
 
     records.update({
-        "Most Points Game": most_points_game,
-        "Least Points Game": least_points_game,
-        "Most Points Season": {
-            "owner": owner_id_to_name.get(most_points_season_owner, ""),
-            "team": owner_id_to_team_name.get(most_points_season_owner, ""),
-            "points": most_points_season.get(most_points_season_owner, ""),
-            "year": year,
-            "week": ""
-        },
-        "Least Points Season": {
-            "owner": owner_id_to_name.get(least_points_season_owner, ""),
-            "team": owner_id_to_team_name.get(least_points_season_owner, ""),
-            "points": least_points_season.get(least_points_season_owner, ""),
-            "year": year,
-            "week": ""
-        },
-        "Largest Point Differential": largest_point_diff,
-        "Smallest Point Differential": smallest_point_diff,
-        "The Managing Maestro": managing_maestro,
+        "Most Points Game": boards.best("highest_game"),
+        "Least Points Game": boards.best("lowest_game"),
+        "Most Points Season": boards.best("best_season"),
+        "Least Points Season": boards.best("worst_season"),
+        "Largest Point Differential": boards.best("biggest_blowout"),
+        "Smallest Point Differential": boards.best("closest_game"),
+        "The Managing Maestro": boards.best("efficiency"),
+        "Leaderboards": boards.to_dict(),
         "Most Free Agent Pickups": {
             "owner": "",
             "team": "",
             "pickups": 0,
-            "year": year
+            "year": SEASON_YEAR
         },
         "Fewest Free Agent Pickups": {
             "owner": "",
             "team": "",
             "pickups": 999999,
-            "year": year
+            "year": SEASON_YEAR
         },
         "The Loyalist": {
             "owner": "",
             "team": "",
             "players_retained": 0,
-            "year": year
+            "year": SEASON_YEAR
         }
     })
 
@@ -730,8 +419,7 @@ def calculate_records():
                 "year": SEASON_YEAR
             })
 
-    # Loyalist - max retained draft players (season 2025 only)
-    loyalist_counts = loyalist_players.get(SEASON_YEAR, {})
+    # Loyalist - max retained draft players (current season only)
     if loyalist_counts:
         max_retained_owner = max(loyalist_counts, key=loyalist_counts.get)
         records["The Loyalist"].update({
@@ -743,16 +431,78 @@ def calculate_records():
 
     return records
 
-def main():
-    print("Gathering records data...")
-    records_data = calculate_records()
-    print("Writing Records tab...")
-    write_records_tab(records_data)
-    print("Writing Current Season tab...")
-    write_current_season_tab()
-    print("Writing Head-to-Head tab...")
-    write_headtohead_tab()
+def draft_tab(data):
+    # stored drafts and player stats only; no ESPN calls
+    analysis = draft.get(data)
+    rows = [["📋 Draft Grades"], ["Owner", "Grade", "Drafts", "Points Over Expected", "By Season"]]
+    headers = [1]
+    for c in analysis["owners"]:
+        rows.append([c["owner"], c["grade"], c["seasons"], c["over_expected"], ", ".join(c["grades"])])
+    for title, picks in (("💎 Best Picks", analysis["best"]), ("💀 Worst Picks", analysis["worst"])):
+        rows.append([])
+        rows.append([title])
+        headers.append(len(rows))
+        rows.append(["Player", "Owner", "Year", "Pick", "Finish", "Value", "Points", "Points Over Expected"])
+        for p in picks:
+            rows.append([p["player"], p["owner"], p["year"], p["pick"], p["finish"], p["value"],
+                         p["points"], p["over_expected"]])
+    return sheet_plan.tab("Draft", rows, header_rows=headers)
+
+# Each step is checkpointed, so a failed run resumes where it stopped;
+# builders take the archive main() loaded
+EXPORT_TABS = [
+    ("Records", None),  # built from the aggregated records below
+    ("Current Season", current_season_tab),
+    ("Head-to-Head", headtohead_tab),
+    ("All-Play", allplay_tab),
+    ("Trends", trends_tab),
+    ("Draft", draft_tab),
+]
+
+@tracing.traced('export')
+def main(resume=True, offline=False, local=False, changed_only=False):
+    global OFFLINE
+    OFFLINE = offline
+    run = checkpoints.Run("export", inputs=[LEAGUE_ID, SEASON_YEAR, SHEET_NAME, offline, local, changed_only],
+                          resume=resume)
+
+    # the archive is loaded (and refreshed, unless offline) once for every tab
+    data = load_data()
+    seasons = []
+    for year in range(SEASON_YEAR - 2, SEASON_YEAR + 1):
+        if offline:
+            seasons.append(collect_season_offline(data, year))
+            continue
+        if not run.done(f"fetch {year}"):
+            print(f"Fetching {year} season...")
+        seasons.append(run.step(f"fetch {year}", lambda: collect_season(year, data)))
+
+    print("Aggregating records...")
+    records_data = run.step("aggregate records", lambda: calculate_records(seasons))
+
+    tabs = []
+    for name, build in EXPORT_TABS:
+        if not run.done(f"render {name}"):
+            print(f"Rendering {name} tab...")
+        tabs.append(run.step(f"render {name}", (lambda: records_tab(records_data)) if build is None
+                             else (lambda: build(data))))
+
+    # every tab goes out in one structural and one values batch request
+    print("Writing workbook...")
+    run.step("write workbook", lambda: write_workbook(tabs, local, changed_only))
+
+    run.finish()
     print("Done!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # --offline: no ESPN calls, everything from the local archive
+    # --local: write CSV files to LOCAL_WORKBOOK_DIR instead of Google Sheets
+    # --changed-only: write only the rows that changed since the last export
+    # --profile: write a collapsed-stack profile of the whole export to DATA_DIR/profiles
+    args = dict(resume="--restart" not in sys.argv, offline="--offline" in sys.argv, local="--local" in sys.argv,
+                changed_only="--changed-only" in sys.argv)
+    if "--profile" in sys.argv:
+        with profiling.profile("export"):
+            main(**args)
+    else:
+        main(**args)
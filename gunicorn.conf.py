@@ -0,0 +1,13 @@
+# Gunicorn settings, read automatically from the working directory
+
+
+def on_starting(server):
+    # bundle CSS / JS (downloading pinned third-party files) once, in the master, before any worker serves
+    import assets
+    assets.build()
+
+
+def post_worker_init(worker):
+    # start loading data as soon as a worker boots so /readyz turns green without waiting for traffic
+    import health
+    health.warm_in_background()
@@ -0,0 +1,104 @@
+# Head-to-head W-L-T matrices
+#
+# Each season is reduced to a small integer array m[kind, a, b] = [wins,
+# losses, ties] of owner a against owner b, with kind 0 for regular season and
+# 1 for playoffs. Within one archive version every season uses the same owner
+# keys, so any season range / game-type view is just the sum of a few
+# matrices. Keys can change between versions (a new season can split former
+# co-owners, see owners.py), so a season's matrix is only carried over from the
+# previous version when its owners kept their keys.
+import numpy as np
+import history
+import memory
+import tracing
+import owners
+
+REGULAR, PLAYOFF = 0, 1
+GAME_TYPES = {'all': slice(None), 'regular': slice(REGULAR, REGULAR + 1), 'playoff': slice(PLAYOFF, PLAYOFF + 1)}
+
+_cache = memory.Cache('h2h')
+
+
+class HeadToHead(object):
+    def __init__(self, data, previous=None):
+        seasons = data['seasons']
+        self.owner_index = owners.get(data)
+        self.owners = [self.owner_index.primary_id(k) for k in range(len(self.owner_index))]
+        self.index = self.owner_index.keys
+        self.names = self.owner_index.names_by_id()
+        self.fetched = {year: seasons[year]['fetched_at'] for year in seasons}
+
+        n = len(self.owners)
+        self.matrices = {}
+        for year in sorted(seasons):
+            if self._reusable(previous, year, seasons[year]):
+                m = previous.matrices[year]
+                pad = n - m.shape[1]
+                self.matrices[year] = np.pad(m, ((0, 0), (0, pad), (0, pad), (0, 0))) if pad else m
+            else:
+                self.matrices[year] = self._season_matrix(seasons[year]['games'], n)
+
+    def _reusable(self, previous, year, season):
+        '''True if previous holds this season unchanged, with every owner in it under the same key'''
+        if previous is None or year not in previous.matrices or previous.fetched[year] != self.fetched[year]:
+            return False
+        if previous.matrices[year].shape[1] > len(self.owners):
+            return False
+        ids = {oid for g in season['games'] for oid in (g['home_id'], g['away_id'])}
+        return all(previous.index.get(oid) == self.index[oid] for oid in ids)
+
+    def _season_matrix(self, games, n):
+        m = np.zeros((2, n, n, 3), dtype=np.int32)
+        for g in games:
+            if not g['final']:
+                continue
+            kind = PLAYOFF if g['playoff'] else REGULAR
+            h, a = self.index[g['home_id']], self.index[g['away_id']]
+            if g['home_score'] > g['away_score']:
+                m[kind, h, a, 0] += 1
+                m[kind, a, h, 1] += 1
+            elif g['away_score'] > g['home_score']:
+                m[kind, a, h, 0] += 1
+                m[kind, h, a, 1] += 1
+            else:
+                m[kind, h, a, 2] += 1
+                m[kind, a, h, 2] += 1
+        return m
+
+    def seasons(self):
+        return sorted(self.matrices)
+
+    def query(self, start=None, end=None, games='all'):
+        '''Summed n x n x 3 W-L-T matrix over seasons start..end (inclusive)'''
+        kinds = GAME_TYPES[games]
+        total = np.zeros((len(self.owners), len(self.owners), 3), dtype=np.int32)
+        for year, m in self.matrices.items():
+            if (start is None or year >= start) and (end is None or year <= end):
+                total += m[kinds].sum(axis=0)
+        return total
+
+    def table(self, start=None, end=None, games='all'):
+        '''Owner ids (sorted by name) and grid rows in the shape headtohead.html expects'''
+        total = self.query(start, end, games)
+        played = total.sum(axis=(1, 2)) > 0
+        owner_ids = sorted((oid for oid in self.owners if played[self.index[oid]]),
+                           key=lambda oid: self.names.get(oid, '').lower())
+
+        table = []
+        for oid in owner_ids:
+            row = {'owner_id': oid, 'owner_name': self.names.get(oid, 'Unknown'), 'record': {}}
+            for opponent_id in owner_ids:
+                if opponent_id == oid:
+                    row['record'][opponent_id] = '—'
+                    continue
+                wins, losses, ties = (int(x) for x in total[self.index[oid], self.index[opponent_id]])
+                row['record'][opponent_id] = f'{wins}-{losses}-{ties}' if ties else f'{wins}-{losses}'
+            table.append(row)
+        return owner_ids, table
+
+
+@tracing.traced('h2h.get')
+def get(data):
+    '''Matrices for the archive, cached per data version; unchanged seasons are reused'''
+    version = history.data_version(data)
+    return _cache.get_or_set(version, lambda: HeadToHead(data, next(iter(_cache.values()), None)), clear=True)
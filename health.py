@@ -0,0 +1,119 @@
+# Liveness and readiness
+#
+# /healthz only says the worker is up. /readyz says whether it can serve
+# pages without a slow first load: the season store is mapped in this worker,
+# the current season was fetched within READY_MAX_AGE, the derived caches
+# have been built from this version of the archive, and the Leagues the app
+# registered with lazy_league() have been fetched. Seasons that failed to
+# fetch are reported but don't block readiness. A worker that isn't ready (or whose data went stale or was
+# replaced by another worker) warms itself in a background thread, started
+# from the readiness check and from gunicorn's post_worker_init hook, so the
+# platform only shifts traffic to it once pages are fast.
+import os
+import time
+import threading
+import history
+import season_store
+import memory
+import h2h
+import allplay
+import trends
+import players
+
+READY_MAX_AGE = int(os.environ.get("READY_MAX_AGE", 6 * 60 * 60))  # seconds since the current season was fetched
+WARM = [('h2h', h2h.get), ('allplay', allplay.compute), ('trends', trends.get)]
+
+STARTED = time.time()
+_lock = threading.Lock()
+_warming = None
+_warmed = None  # (data version, time) of the last completed warm-up
+_last_error = None
+_leagues = {}  # name -> (getter, state) for lazy_league()
+
+
+def lazy_league(name, load):
+    '''A getter for a League fetched on first use (or by the warm-up) instead of at import'''
+    state = {}
+
+    def get():
+        if 'league' not in state:
+            state['league'] = load()
+        return state['league']
+
+    _leagues[name] = (get, state)
+    return get
+
+
+def warm():
+    '''Map (rebuilding if needed) the store and build the derived caches from it'''
+    global _warmed, _last_error
+    try:
+        data = season_store.current().to_history()
+        for name, build in WARM:
+            build(data)
+        players.get()
+        for get, _ in _leagues.values():
+            get()
+        _warmed = (history.data_version(data), time.time())
+    except Exception as e:
+        print(f"Warming caches failed: {e}")
+        _last_error = {'at': time.time(), 'error': f"{type(e).__name__}: {e}"}
+
+
+def warm_in_background():
+    '''Start a warm-up unless one is already running'''
+    global _warming
+    with _lock:
+        if _warming is None or not _warming.is_alive():
+            _warming = threading.Thread(target=warm, name='warm', daemon=True)
+            _warming.start()
+
+
+def liveness():
+    return {'status': 'ok', 'pid': os.getpid(), 'uptime_seconds': round(time.time() - STARTED, 1)}
+
+
+def readiness():
+    '''(ready, report); never loads anything itself'''
+    now = time.time()
+    store = season_store.mapped()
+    problems = []
+    report = {'pid': os.getpid(), 'warming': _warming is not None and _warming.is_alive(), 'live_week': None}
+
+    if store is None:
+        problems.append('season store not loaded')
+    else:
+        data = store.to_history()
+        report['store_age_seconds'] = round(now - store.built_at, 1)
+        # seasons that failed to fetch are retried on the refresh TTL; see errors
+        report['missing_seasons'] = sorted(set(history.SEASONS) - set(int(y) for y in store.seasons['year']))
+        current = data['seasons'].get(history.SEASON_YEAR)
+        if current is None:
+            problems.append(f"{history.SEASON_YEAR} season not loaded")
+        else:
+            age = now - current['fetched_at']
+            report['current_season'] = {'year': current['year'], 'complete': current['complete'],
+                                        'age_seconds': round(age, 1)}
+            # first unfinished week of the archived current season
+            report['live_week'] = history.week_status(current)[1]
+            if not current['complete'] and age > READY_MAX_AGE:
+                problems.append(f"{history.SEASON_YEAR} season is {age / 60:.0f} minutes old")
+        if _warmed is None or _warmed[0] != history.data_version(data):
+            problems.append('caches not built for the current data')
+        # a refresh is due or another worker published a newer store
+        if store.is_stale() or store.replaced():
+            warm_in_background()
+
+    report['leagues'] = {name: 'league' in state for name, (_, state) in _leagues.items()}
+    problems.extend(f"{name} league not loaded" for name, loaded in report['leagues'].items() if not loaded)
+
+    report['warmed_seconds_ago'] = round(now - _warmed[1], 1) if _warmed else None
+    report['caches'] = {name: {'entries': len(c['entries']), 'bytes': c['bytes']}
+                        for name, c in memory.report()['caches'].items()}
+    # refresh errors are seen by whichever worker did the fetch
+    report['errors'] = {'warm': _last_error, 'seasons': history.refresh_errors}
+    report['problems'] = problems
+    report['status'] = 'ready' if not problems else 'not ready'
+    if problems:
+        warm_in_background()
+    return not problems, report
@@ -0,0 +1,291 @@
+# Local archive of league history
+#
+# Every season is fetched from ESPN once and stored as plain JSON in DATA_DIR.
+# Completed seasons are never refetched unless they were stored under an older
+# ARCHIVE_FORMAT; the current season is refreshed when it is older than
+# CURRENT_TTL. Everything the dashboard and the Sheets export
+# aggregate (games, head-to-head, records) is derived from this archive.
+import os
+import json
+import time
+import fcntl
+from contextlib import contextmanager
+from collections import defaultdict
+import espn_http
+import tracing
+
+LEAGUE_ID = 284843139
+
+FIRST_SEASON = int(os.environ.get("FIRST_SEASON", 2021))
+SEASON_YEAR = int(os.environ.get("SEASON_YEAR", 2025))
+SEASONS = range(FIRST_SEASON, SEASON_YEAR + 1)
+
+DATA_DIR = os.environ.get("FF_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+HISTORY_PATH = os.path.join(DATA_DIR, "history.json")
+CURRENT_TTL = 15 * 60  # seconds before an unfinished season is refetched
+# bumped whenever fetch_season() starts recording something differently; seasons
+# stored under an older format (or none: 1) are refetched once, complete or not
+# 2: game weeks from matchup periods, divisions and the playoff seeding rule
+ARCHIVE_FORMAT = 2
+
+refresh_errors = {}  # year -> last failed fetch {'at', 'error'}, cleared by the next success
+
+
+def get_league(year):
+    # credentials are read at call time so callers can load_dotenv() first
+    return espn_http.league(LEAGUE_ID, year, espn_s2=os.environ.get("ESPN_S2"), swid=os.environ.get("SWID"))
+
+
+def owner_info(team):
+    if team and team.owners:
+        owner = team.owners[0]
+        return owner.get('id', 'unknown_id'), owner.get('displayName', 'Unknown')
+    return 'unknown_id', 'Unknown'
+
+
+# --- Ingestion ---
+
+def fetch_season(year, league=None):
+    '''Fetch one season from ESPN (or flatten an already fetched League) into an archive record'''
+    league = league or get_league(year)
+    settings = league.settings
+    reg_season_count = settings.reg_season_count
+
+    teams = []
+    for team in league.teams:
+        owner_id, owner_name = owner_info(team)
+        teams.append({
+            'team_id': team.team_id,
+            'owner_id': owner_id,
+            'owner_name': owner_name,
+            'co_owners': [{'id': o.get('id', 'unknown_id'), 'name': o.get('displayName', 'Unknown')}
+                          for o in team.owners[1:]],
+            'team_name': team.team_name,
+            'division_id': team.division_id,
+            'logo': getattr(team, 'logo_url', ''),
+            'wins': team.wins,
+            'losses': team.losses,
+            'ties': team.ties,
+            'points_for': team.points_for,
+            'points_against': team.points_against,
+            'standing': team.standing,
+            'final_standing': team.final_standing,
+        })
+
+    # team.schedule / team.scores already hold every matchup the team played,
+    # so no per-week scoreboard requests are needed. They skip the weeks a team
+    # sat out, so the week is the matchup period espn_http recorded for each
+    # entry (or the position, for leagues that didn't come from espn_http).
+    periods = {team.team_id: getattr(team, 'matchup_periods', None) or range(1, len(team.schedule) + 1)
+               for team in league.teams}
+    games = []
+    for team in league.teams:
+        for idx, (week, opponent) in enumerate(zip(periods[team.team_id], team.schedule)):
+            if opponent is team or team.team_id > opponent.team_id:
+                continue  # bye week, or the pair was recorded from the other side
+            opp_idx = list(periods[opponent.team_id]).index(week)
+            home_id, _ = owner_info(team)
+            away_id, _ = owner_info(opponent)
+            games.append({
+                'year': year,
+                'week': week,
+                'home_id': home_id,
+                'away_id': away_id,
+                'home_score': team.scores[idx] or 0,
+                'away_score': opponent.scores[opp_idx] or 0,
+                'playoff': week > reg_season_count,
+                'final': team.outcomes[idx] != 'U',
+            })
+    games.sort(key=lambda g: g['week'])
+
+    return {
+        'year': year,
+        'format': ARCHIVE_FORMAT,
+        'fetched_at': time.time(),
+        'complete': bool(games) and all(g['final'] for g in games),
+        'reg_season_count': reg_season_count,
+        'playoff_team_count': settings.playoff_team_count,
+        'playoff_seed_tie_rule': settings.playoff_seed_tie_rule,  # TOTAL_POINTS_SCORED or H2H_RECORD
+        'teams': teams,
+        'games': games,
+    }
+
+
+def build_h2h_index(seasons):
+    '''Map (owner_a, owner_b) to every final game between them, from a's side'''
+    index = defaultdict(list)
+    for season in seasons:
+        for g in season['games']:
+            if not g['final']:
+                continue
+            for a, b, score, opp_score in (
+                (g['home_id'], g['away_id'], g['home_score'], g['away_score']),
+                (g['away_id'], g['home_id'], g['away_score'], g['home_score']),
+            ):
+                index[(a, b)].append({
+                    'year': g['year'],
+                    'week': g['week'],
+                    'score': score,
+                    'opp_score': opp_score,
+                    'margin': round(score - opp_score, 2),
+                    'playoff': g['playoff'],
+                })
+    return index
+
+
+def _encode_index(index):
+    return {f"{a}|{b}": games for (a, b), games in index.items()}
+
+
+def _decode_index(raw):
+    index = defaultdict(list)
+    for key, games in raw.items():
+        a, b = key.split('|', 1)
+        index[(a, b)] = games
+    return index
+
+
+# --- Archive ---
+
+def read_archive(path=HISTORY_PATH):
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return {'seasons': {}, 'h2h_index': {}}
+    return raw
+
+
+@contextmanager
+def archive_lock(path=HISTORY_PATH):
+    '''Held around every read-modify-write of the archive, across processes'''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def write_archive(archive, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(archive, f)
+    os.replace(tmp, path)
+
+
+def patch_season(year, games, teams, path=HISTORY_PATH):
+    '''Replace individual game and team records of an archived season; returns the archive as load_history() does'''
+    with archive_lock(path):
+        archive = read_archive(path)
+        season = archive['seasons'][str(year)]
+        games = {(g['week'], g['home_id'], g['away_id']): g for g in games}
+        season['games'] = [games.get((g['week'], g['home_id'], g['away_id']), g) for g in season['games']]
+        teams = {t['team_id']: t for t in teams}
+        season['teams'] = [teams.get(t['team_id'], t) for t in season['teams']]
+        # a new fetched_at makes every cache keyed on it rebuild this season
+        season['fetched_at'] = time.time()
+
+        ordered = [archive['seasons'][k] for k in sorted(archive['seasons'])]
+        archive['h2h_index'] = _encode_index(build_h2h_index(ordered))
+        write_archive(archive, path)
+    return {
+        'seasons': {int(k): v for k, v in archive['seasons'].items()},
+        'h2h_index': _decode_index(archive['h2h_index']),
+    }
+
+
+def _needs_fetch(season, refresh):
+    if season is None or season.get('format', 1) < ARCHIVE_FORMAT:
+        return True
+    if season['complete']:
+        return False
+    return refresh or time.time() - season['fetched_at'] > CURRENT_TTL
+
+
+def load_history(seasons=SEASONS, refresh=False, path=HISTORY_PATH, offline=False):
+    '''Return the archive, fetching any missing or stale seasons first (never when offline)'''
+    archive = read_archive(path)
+    fetched = {}
+
+    # ESPN is called without the lock held; only the write below is serialised
+    for year in seasons:
+        if offline or not _needs_fetch(archive['seasons'].get(str(year)), refresh):
+            continue
+        try:
+            with tracing.span('history.fetch_season', year=year):
+                fetched[str(year)] = fetch_season(year)
+            refresh_errors.pop(year, None)
+        except Exception as e:
+            print(f"Failed to load season {year}: {e}")
+            refresh_errors[year] = {'at': time.time(), 'error': f"{type(e).__name__}: {e}"}
+
+    if fetched:
+        with archive_lock(path):
+            # merge into the archive as it is now, not as it was read, so other writers' changes survive
+            archive = read_archive(path)
+            archive['seasons'].update(fetched)
+            ordered = [archive['seasons'][k] for k in sorted(archive['seasons'])]
+            archive['h2h_index'] = _encode_index(build_h2h_index(ordered))
+            write_archive(archive, path)
+    stored = archive['seasons']
+
+    return {
+        'seasons': {int(k): v for k, v in stored.items()},
+        'h2h_index': _decode_index(archive['h2h_index']),
+    }
+
+
+def week_status(season):
+    '''(weeks whose games are all final, first unfinished week or None) of a season'''
+    weeks = sorted({g['week'] for g in season['games']})
+    final = [w for w in weeks if all(g['final'] for g in season['games'] if g['week'] == w)]
+    live = next((w for w in weeks if w not in final), None)
+    return final, live
+
+
+def data_version(history):
+    '''Identifies the archive contents; derived caches are keyed on it'''
+    return tuple(sorted((year, s['fetched_at']) for year, s in history['seasons'].items()))
+
+
+# --- Rivalry stats ---
+
+def rivalry_stats(games):
+    '''Summarise a list of games taken from one owner's side of the index'''
+    games = sorted(games, key=lambda g: (g['year'], g['week']))
+    wins = sum(1 for g in games if g['margin'] > 0)
+    losses = sum(1 for g in games if g['margin'] < 0)
+    ties = len(games) - wins - losses
+
+    longest_win = longest_loss = 0
+    run = 0  # current streak: positive for wins, negative for losses
+    for g in games:
+        result = (g['margin'] > 0) - (g['margin'] < 0)
+        if result == 0:
+            run = 0
+        elif run and (run > 0) == (result > 0):
+            run += result
+        else:
+            run = result
+        longest_win = max(longest_win, run)
+        longest_loss = max(longest_loss, -run)
+
+    count = len(games) or 1
+    return {
+        'games': len(games),
+        'wins': wins,
+        'losses': losses,
+        'ties': ties,
+        'points_for': round(sum(g['score'] for g in games), 2),
+        'points_against': round(sum(g['opp_score'] for g in games), 2),
+        'avg_margin': round(sum(g['margin'] for g in games) / count, 2),
+        'biggest_win': max((g for g in games if g['margin'] > 0), key=lambda g: g['margin'], default=None),
+        'biggest_loss': min((g for g in games if g['margin'] < 0), key=lambda g: g['margin'], default=None),
+        'streak': run,
+        'longest_win_streak': longest_win,
+        'longest_loss_streak': longest_loss,
+        'playoff_games': sum(1 for g in games if g['playoff']),
+    }
@@ -0,0 +1,135 @@
+# Top-N leaderboards for every record category
+#
+# Each category keeps a bounded min-heap of its N best entries while games are
+# streamed through once, so building every leaderboard over all of the league's
+# history costs O(games * log N) and ties / runners-up are kept.
+import os
+import heapq
+from itertools import count
+
+LEADERBOARD_SIZE = int(os.environ.get("LEADERBOARD_SIZE", 50))
+PER_PAGE = 10
+BENCH_SLOTS = ('BE', 'IR')
+
+# key, title, True if bigger is better
+CATEGORIES = [
+    ('highest_game', 'Most Points in a Game', True),
+    ('lowest_game', 'Least Points in a Game', False),
+    ('biggest_blowout', 'Largest Point Differential', True),
+    ('closest_game', 'Smallest Point Differential', False),
+    ('best_season', 'Most Points in a Season', True),
+    ('worst_season', 'Least Points in a Season', False),
+    ('efficiency', 'Manager Efficiency (Starters / Max Possible)', True),
+]
+TITLES = {key: title for key, title, _ in CATEGORIES}
+
+
+class TopN(object):
+    '''Keeps the n best (value, entry) pairs seen so far'''
+    def __init__(self, n, largest=True):
+        self.n = n
+        self.sign = 1 if largest else -1
+        self._heap = []  # worst kept entry on top
+        self._seq = count()  # insertion order breaks ties, older entries rank first
+
+    def push(self, value, entry):
+        item = (self.sign * value, -next(self._seq), entry)
+        if len(self._heap) < self.n:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def ranked(self):
+        return [entry for _, _, entry in sorted(self._heap, key=lambda i: i[:2], reverse=True)]
+
+
+class Leaderboards(object):
+    def __init__(self, n=LEADERBOARD_SIZE):
+        self.boards = {key: TopN(n, largest) for key, _, largest in CATEGORIES}
+
+    def add_score(self, year, week, owner, team, points):
+        entry = {'owner': owner, 'team': team, 'points': round(points, 2), 'year': year, 'week': week}
+        self.boards['highest_game'].push(points, entry)
+        self.boards['lowest_game'].push(points, entry)
+
+    def add_game(self, year, week, home, away, home_score, away_score):
+        '''home / away are (owner, team) name pairs'''
+        self.add_score(year, week, home[0], home[1], home_score)
+        self.add_score(year, week, away[0], away[1], away_score)
+
+        diff = abs(home_score - away_score)
+        if diff == 0:
+            return  # ties aren't a differential
+        (winner, loser) = (home, away) if home_score > away_score else (away, home)
+        entry = {
+            'winner_owner': winner[0],
+            'loser_owner': loser[0],
+            'winner_team': winner[1],
+            'loser_team': loser[1],
+            'point_diff': round(diff, 2),
+            'year': year,
+            'week': week
+        }
+        self.boards['biggest_blowout'].push(diff, entry)
+        self.boards['closest_game'].push(diff, entry)
+
+    def add_season(self, year, owner, team, points):
+        entry = {'owner': owner, 'team': team, 'points': round(points, 2), 'year': year, 'week': '-'}
+        self.boards['best_season'].push(points, entry)
+        self.boards['worst_season'].push(points, entry)
+
+    def add_efficiency(self, year, owner, team, efficiency):
+        entry = {'owner': owner, 'team': team, 'efficiency': round(efficiency, 4), 'year': year}
+        self.boards['efficiency'].push(efficiency, entry)
+
+    def ranked(self, key):
+        return self.boards[key].ranked()
+
+    def best(self, key):
+        ranked = self.ranked(key)
+        return ranked[0] if ranked else {}
+
+    def to_dict(self):
+        return {key: self.ranked(key) for key in self.boards}
+
+
+def page(entries, page_num, per_page=PER_PAGE):
+    '''One page of a ranked list, with ranks attached'''
+    pages = max(1, -(-len(entries) // per_page))
+    page_num = min(max(1, page_num), pages)
+    start = (page_num - 1) * per_page
+    rows = [dict(entry, rank=start + i + 1) for i, entry in enumerate(entries[start:start + per_page])]
+    return {'rows': rows, 'page': page_num, 'pages': pages}
+
+
+def from_history(data, n=LEADERBOARD_SIZE):
+    '''Game and season leaderboards from the local archive in a single pass'''
+    boards = Leaderboards(n)
+    for year in sorted(data['seasons']):
+        season = data['seasons'][year]
+        names = {t['owner_id']: (t['owner_name'], t['team_name']) for t in season['teams']}
+        for g in season['games']:
+            if g['final']:
+                boards.add_game(year, g['week'], names[g['home_id']], names[g['away_id']],
+                                g['home_score'], g['away_score'])
+        if season['complete']:
+            for t in season['teams']:
+                boards.add_season(year, t['owner_name'], t['team_name'], t['points_for'])
+    return boards
+
+
+def lineup_efficiency(lineup, slot_counts):
+    '''(starter points, best possible starter points) for one box score lineup'''
+    actual = sum(p.points for p in lineup if p.slot_position not in BENCH_SLOTS)
+
+    # fill fixed positions before flex spots, taking the best eligible player left
+    slots = [s for s, c in slot_counts.items() if c and s not in BENCH_SLOTS]
+    slots.sort(key=lambda s: '/' in s or s == 'OP')
+    used = set()
+    best = 0
+    for slot in slots:
+        eligible = [p for p in lineup if id(p) not in used and slot in getattr(p, 'eligibleSlots', [p.position])]
+        for player in sorted(eligible, key=lambda p: p.points, reverse=True)[:slot_counts[slot]]:
+            used.add(id(player))
+            best += player.points
+    return actual, max(best, actual)
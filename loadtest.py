@@ -0,0 +1,176 @@
+# Load test for the dashboard
+#
+# Starts the app under gunicorn against the local ESPN stand-in
+# (espn_standin.py) once per worker/thread configuration, drives its pages at a
+# fixed concurrency and reports throughput and p50/p95/p99 latency per route.
+# Every configuration serves the same archive (built during the first warm-up
+# in a temporary data directory), so the configurations compare like for like.
+# The report is printed and saved as JSON in DATA_DIR/loadtest/.
+# Run with: python loadtest.py [--configs 1x1,2x4] [--concurrency 8] [--requests 400]
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+import history
+
+REPORT_DIR = os.path.join(history.DATA_DIR, "loadtest")
+READY_TIMEOUT = 120  # seconds for a server to build the archive and answer
+PERCENTILES = (50, 95, 99)
+PROBE_ROUTES = ('/healthz', '/readyz')  # cheap by design, and /readyz answers 503 until warm
+
+
+def standin_app():
+    '''The Flask app wired to the ESPN stand-in; gunicorn 'loadtest:standin_app()' '''
+    import espn_standin
+    espn_standin.install()
+    import app
+    return app.app
+
+
+def default_routes():
+    '''Every GET page of the app that takes no arguments, leaving out probes and /debug/'''
+    return sorted(rule.rule for rule in standin_app().url_map.iter_rules()
+                  if 'GET' in rule.methods and not rule.arguments and rule.endpoint != 'static'
+                  and rule.rule not in PROBE_ROUTES and not rule.rule.startswith('/debug/'))
+
+
+# --- Server ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, threads, data_dir, latency):
+    port = _free_port()
+    env = dict(os.environ, FF_DATA_DIR=data_dir, STANDIN_LATENCY=str(latency))
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--timeout', str(READY_TIMEOUT), '--log-level', 'warning',
+         'loadtest:standin_app()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+    return proc, f'http://127.0.0.1:{port}'
+
+
+def wait_ready(proc, base_url, timeout=READY_TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with status {proc.returncode}")
+        try:
+            requests.get(base_url + '/', timeout=timeout)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server not ready after {timeout}s")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+# --- Load ---
+
+def drive(base_url, routes, concurrency, total):
+    '''Send total requests round-robin over routes from concurrency clients; (samples, wall seconds)'''
+    def client(i):
+        session = requests.Session()
+        samples = []
+        for n in range(i, total, concurrency):
+            route = routes[n % len(routes)]
+            start = time.perf_counter()
+            try:
+                ok = session.get(base_url + route, timeout=READY_TIMEOUT).status_code == 200
+            except requests.RequestException:
+                ok = False
+            samples.append((route, time.perf_counter() - start, ok))
+        return samples
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = [s for client_samples in pool.map(client, range(concurrency)) for s in client_samples]
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, wall):
+    '''Per-route and overall throughput, latency percentiles (ms) and errors'''
+    def stats(group):
+        latencies = np.array([s[1] for s in group]) * 1000
+        result = {'requests': len(group), 'errors': sum(not s[2] for s in group),
+                  'throughput': round(len(group) / wall, 2), 'mean_ms': round(float(latencies.mean()), 2)}
+        for p, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+            result[f'p{p}_ms'] = round(float(value), 2)
+        return result
+
+    routes = {}
+    for s in samples:
+        routes.setdefault(s[0], []).append(s)
+    return {'overall': stats(samples), 'routes': {route: stats(group) for route, group in sorted(routes.items())}}
+
+
+def run_config(workers, threads, data_dir, routes, concurrency, total, latency):
+    proc, base_url = start_server(workers, threads, data_dir, latency)
+    try:
+        wait_ready(proc, base_url)
+        # warm-up: every route once per worker so caches are filled before timing
+        drive(base_url, routes, concurrency, len(routes) * workers)
+        samples, wall = drive(base_url, routes, concurrency, total)
+    finally:
+        stop_server(proc)
+    return dict(workers=workers, threads=threads, wall_seconds=round(wall, 2), **summarize(samples, wall))
+
+
+def print_report(report):
+    for c in report['configs']:
+        o = c['overall']
+        print(f"\n{c['workers']} worker(s) x {c['threads']} thread(s): {o['throughput']} req/s, "
+              f"p50 {o['p50_ms']} ms, p95 {o['p95_ms']} ms, p99 {o['p99_ms']} ms, {o['errors']} errors")
+        for route, r in c['routes'].items():
+            print(f"  {route:<16} {r['throughput']:>8} req/s  p50 {r['p50_ms']:>8}  p95 {r['p95_ms']:>8}  "
+                  f"p99 {r['p99_ms']:>8} ms  {r['errors']} errors")
+
+
+def main(configs, routes=None, concurrency=8, total=400, latency=0.05):
+    routes = routes or default_routes()
+    report = {'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'routes': routes, 'concurrency': concurrency,
+              'requests': total, 'standin_latency': latency, 'configs': []}
+    with tempfile.TemporaryDirectory() as data_dir:
+        for workers, threads in configs:
+            print(f"Load testing {workers} worker(s) x {threads} thread(s)...")
+            report['configs'].append(run_config(workers, threads, data_dir, routes, concurrency, total, latency))
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    path = os.path.join(REPORT_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print_report(report)
+    print(f"\nReport written to {path}")
+    return report
+
+
+def _configs(value):
+    return [tuple(int(n) for n in c.split('x')) for c in value.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the dashboard against the ESPN stand-in')
+    parser.add_argument('--configs', type=_configs, default=_configs('1x1,2x4'),
+                        help='worker x thread configurations, e.g. 1x1,2x4,4x8')
+    parser.add_argument('--routes', type=lambda v: v.split(','), help='comma-separated paths (default: every page)')
+    parser.add_argument('--concurrency', type=int, default=8, help='simultaneous clients')
+    parser.add_argument('--requests', type=int, default=400, help='timed requests per configuration')
+    parser.add_argument('--latency', type=float, default=0.05, help='simulated ESPN latency in seconds')
+    args = parser.parse_args()
+    main(args.configs, args.routes, args.concurrency, args.requests, args.latency)
@@ -0,0 +1,52 @@
+# Local stand-in for the Google spreadsheet
+#
+# Accepts the same three calls sheet_plan.apply() and update() make on a
+# gspread Spreadsheet and writes every tab to <directory>/<tab>.csv instead, so
+# the workbook can be regenerated and inspected without Sheets credentials or
+# network access. The structural / formatting requests of the last write are
+# kept in <directory>/batch_update.json.
+import os
+import re
+import csv
+import json
+
+
+class LocalWorkbook(object):
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, title):
+        return os.path.join(self.directory, title.replace('/', '_') + '.csv')
+
+    def fetch_sheet_metadata(self, params=None):
+        # every write recreates its tabs from scratch
+        return {'sheets': []}
+
+    def batch_update(self, body):
+        with open(os.path.join(self.directory, 'batch_update.json'), 'w') as f:
+            json.dump(body, f, indent=1)
+        # a tab written in full starts empty
+        for request in body['requests']:
+            if 'addSheet' in request and os.path.exists(self._path(request['addSheet']['properties']['title'])):
+                os.remove(self._path(request['addSheet']['properties']['title']))
+
+    def values_batch_update(self, body):
+        for block in body['data']:
+            match = re.match(r"'(.*)'!A(\d+)$", block['range'])
+            if not match:
+                raise ValueError(f"Unsupported range: {block['range']}")
+            path = self._path(match.group(1).replace("''", "'"))
+            first = int(match.group(2)) - 1
+            rows = []
+            if os.path.exists(path):
+                with open(path, newline='') as f:
+                    rows = list(csv.reader(f))
+            rows += [[] for _ in range(first + len(block['values']) - len(rows))]
+            # cells the block doesn't reach keep their values, as in Sheets
+            for i, values in enumerate(block['values']):
+                row = rows[first + i]
+                row += [""] * (len(values) - len(row))
+                row[:len(values)] = values
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerows(rows)
@@ -0,0 +1,197 @@
+# Per-worker memory accounting for the in-process caches
+#
+# Every module-level cache is a Cache registered here by name. Each entry's
+# size is estimated when it is stored (numpy buffers, containers and object
+# attributes, with large containers sampled), and all entries of all caches
+# share one least-recently-used order. When the total goes over BUDGET the
+# least recently used entries are evicted - whichever cache they belong to -
+# so a worker's cached data stays under a fixed size; an evicted entry is
+# simply rebuilt by its owner on next use, so owners go through get() or
+# get_or_set(), which never fail on a key evicted by another thread.
+# report() feeds the diagnostics endpoint.
+import os
+import sys
+import time
+import threading
+from itertools import islice
+from collections import OrderedDict
+import numpy as np
+import tracing
+
+BUDGET = int(float(os.environ.get("CACHE_BUDGET_MB", 128)) * 2 ** 20)  # bytes per worker
+SAMPLE = 500  # containers longer than this are sized from their first SAMPLE items
+
+_caches = {}  # name -> Cache
+_lru = OrderedDict()  # (cache name, key) -> size, least recently used first
+_lock = threading.RLock()
+_total = 0
+_evictions = 0
+
+
+# --- Size estimates ---
+
+def estimate(obj):
+    '''Approximate bytes held by obj and everything it references'''
+    seen = set()
+    total = 0
+    stack = [(obj, 1.0)]
+    while stack:
+        o, weight = stack.pop()
+        if id(o) in seen or isinstance(o, (type, type(sys), type(estimate))):
+            continue
+        seen.add(id(o))
+        total += weight * sys.getsizeof(o)
+
+        if isinstance(o, np.ndarray):
+            # views count their base once; mapped files aren't process memory
+            if o.base is not None:
+                stack.append((o.base, weight))
+            continue
+        if isinstance(o, (str, bytes, bytearray, int, float, bool)) or o is None:
+            continue
+
+        if isinstance(o, dict):
+            items = [x for kv in islice(o.items(), SAMPLE) for x in kv]
+            n = len(o)
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            items = list(islice(o, SAMPLE))
+            n = len(o)
+        else:
+            items = list(getattr(o, '__dict__', {}).values())
+            items += [getattr(o, s) for s in getattr(type(o), '__slots__', ()) if hasattr(o, s)]
+            n = None
+        scale = weight * n / SAMPLE if n and n > SAMPLE else weight
+        stack.extend((item, scale) for item in items)
+    return int(total)
+
+
+def rss():
+    '''Current resident set size of this process in bytes, or None where /proc isn't available'''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# --- Caches ---
+
+class Cache(object):
+    '''dict-like cache whose entries count against the worker budget'''
+
+    def __init__(self, name):
+        self.name = name
+        self._entries = {}
+        self._used = {}  # key -> last access time
+        _caches[name] = self
+
+    def __contains__(self, key):
+        hit = key in self._entries
+        tracing.cache_outcome(self.name, hit)
+        return hit
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, key):
+        with _lock:
+            value = self._entries[key]
+            self._used[key] = time.time()
+            _lru.move_to_end((self.name, key))
+            return value
+
+    def get(self, key, default=None):
+        with _lock:
+            hit = key in self._entries
+            value = self[key] if hit else default
+        tracing.cache_outcome(self.name, hit)
+        return value
+
+    def get_or_set(self, key, build, clear=False):
+        '''The cached value, or build()'s result stored and returned
+
+        build runs outside the lock, so two threads missing together may both
+        build; the value returned is always the one this thread got, even if
+        it is evicted straight away. With clear, the new entry replaces every
+        other entry of this cache.
+        '''
+        with _lock:
+            hit = key in self._entries
+            value = self[key] if hit else None
+        tracing.cache_outcome(self.name, hit)
+        if hit:
+            return value
+        value = build()
+        if clear:
+            self.clear()
+        self[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        global _total
+        size = estimate(value)
+        with _lock:
+            self._forget(key)
+            self._entries[key] = value
+            self._used[key] = time.time()
+            _lru[(self.name, key)] = size
+            _total += size
+            _evict(keep=(self.name, key))
+
+    def values(self):
+        return list(self._entries.values())
+
+    def items(self):
+        return list(self._entries.items())
+
+    def update(self, entries):
+        for key, value in entries.items():
+            self[key] = value
+
+    def clear(self):
+        with _lock:
+            for key in list(self._entries):
+                self._forget(key)
+
+    def _forget(self, key):
+        global _total
+        if key in self._entries:
+            del self._entries[key]
+            del self._used[key]
+            _total -= _lru.pop((self.name, key))
+
+    def sizes(self):
+        return {key: _lru[(self.name, key)] for key in self._entries}
+
+
+def _evict(keep):
+    '''Drop least recently used entries until the total fits the budget (never keep itself)'''
+    global _evictions
+    for name, key in list(_lru):
+        if _total <= BUDGET:
+            break
+        if (name, key) != keep:
+            _caches[name]._forget(key)
+            _evictions += 1
+
+
+def report():
+    '''Budget, usage and every cached entry with its estimated size'''
+    with _lock:
+        now = time.time()
+        caches = {}
+        for name, cache in sorted(_caches.items()):
+            sizes = cache.sizes()
+            caches[name] = {
+                'bytes': sum(sizes.values()),
+                'entries': [{'key': repr(key), 'bytes': size, 'idle_seconds': round(now - cache._used[key], 1)}
+                            for key, size in sizes.items()],
+            }
+        return {
+            'pid': os.getpid(),
+            'rss_bytes': rss(),
+            'budget_bytes': BUDGET,
+            'cached_bytes': _total,
+            'evictions': _evictions,
+            'caches': caches,
+        }
@@ -0,0 +1,100 @@
+# Cross-season owner identity index
+#
+# ESPN identifies managers by owner id strings, a team can have co-owners and
+# display names / team names change between seasons. The index gives every
+# manager one stable integer key (assigned in order of first appearance) that
+# all of their ESPN ids map to, plus the name, team name and logo history, so
+# aggregation code can index arrays by key instead of repeating owner lookups.
+# Co-owners join a franchise's key unless the archive has them running a
+# different team from one of its owners in some season; former co-owners who
+# go on to face each other must keep separate keys.
+import history
+import memory
+
+_cache = memory.Cache('owners')
+
+
+def _ids(team):
+    return [team['owner_id']] + [c['id'] for c in team.get('co_owners', [])]
+
+
+def rivals(data):
+    '''Pairs of owner ids that ran different teams in the same season'''
+    pairs = set()
+    for season in data['seasons'].values():
+        teams = [_ids(t) for t in season['teams']]
+        for i, ids in enumerate(teams):
+            for other in teams[i + 1:]:
+                pairs.update(frozenset((a, b)) for a in ids for b in other if a != b)
+    return pairs
+
+
+class OwnerIndex(object):
+    def __init__(self, rivals=()):
+        self.keys = {}  # ESPN owner id -> key
+        self.owners = []  # key -> record
+        self.rivals = set(rivals)  # frozenset id pairs that must never share a key
+
+    def _can_join(self, key, ids):
+        return not any(frozenset((a, b)) in self.rivals for a in self.owners[key]['ids'] for b in ids)
+
+    def add_team(self, year, team):
+        '''Register one archived team record (see history.fetch_season)'''
+        ids = _ids(team)
+        # a franchise keeps its key if its owner, or a co-owner it can be merged with, was seen before
+        key = self.keys.get(team['owner_id'])
+        if key is None:
+            key = next((self.keys[i] for i in ids[1:] if i in self.keys and self._can_join(self.keys[i], ids)), None)
+        if key is None:
+            key = len(self.owners)
+            self.owners.append({'key': key, 'ids': [], 'names': {}, 'teams': {}, 'co_owners': {}})
+        record = self.owners[key]
+        for i in ids:
+            if i not in self.keys and (i == team['owner_id'] or self._can_join(key, [i])):
+                self.keys[i] = key
+                record['ids'].append(i)
+
+        record['names'][year] = team['owner_name']
+        record['teams'][year] = {'team_id': team['team_id'], 'team_name': team['team_name'], 'logo': team['logo']}
+        if team.get('co_owners'):
+            record['co_owners'][year] = [c['name'] for c in team['co_owners']]
+        return key
+
+    def key(self, owner_id):
+        return self.keys[owner_id]
+
+    def __len__(self):
+        return len(self.owners)
+
+    def _latest(self, history_by_year, year):
+        if year is not None and year in history_by_year:
+            return history_by_year[year]
+        return history_by_year[max(history_by_year)] if history_by_year else None
+
+    def name(self, key, year=None):
+        '''Display name in the given season, or the most recent one'''
+        return self._latest(self.owners[key]['names'], year) or 'Unknown'
+
+    def team(self, key, year=None):
+        return self._latest(self.owners[key]['teams'], year) or {'team_id': None, 'team_name': '', 'logo': ''}
+
+    def primary_id(self, key):
+        return self.owners[key]['ids'][0]
+
+    def names_by_id(self):
+        '''ESPN owner id -> latest display name, for templates keyed by owner id'''
+        return {owner_id: self.name(key) for owner_id, key in self.keys.items()}
+
+
+def build(data):
+    index = OwnerIndex(rivals(data))
+    for year in sorted(data['seasons']):
+        for team in data['seasons'][year]['teams']:
+            index.add_team(year, team)
+    return index
+
+
+def get(data):
+    '''Owner index for the archive, cached per data version'''
+    version = history.data_version(data)
+    return _cache.get_or_set(version, lambda: build(data), clear=True)
@@ -0,0 +1,281 @@
+# Player-level weekly stat warehouse
+#
+# Every box score lineup slot becomes one fixed-width row (season, week, team,
+# player, slot, points, projected) in DATA_DIR/players/<year>.npy, with player
+# names / positions / eligible slots and the league's lineup settings in a JSON
+# sidecar. Finished weeks are ingested once; the live week is replaced on every
+# sync. Rows are kept sorted by (year, week, team), so a team-week is one
+# contiguous slice, and a second argsort gives every player's weeks.
+import os
+import json
+import time
+from types import SimpleNamespace
+import numpy as np
+import history
+import memory
+import tracing
+import leaderboards
+import transactions
+
+PLAYERS_DIR = os.path.join(history.DATA_DIR, "players")
+FIRST_BOX_SCORE_SEASON = 2019  # ESPN has no box scores before this
+
+ROW_DTYPE = np.dtype([
+    ('year', '<i2'), ('week', '<i2'), ('team_id', '<i2'), ('slot', '<i2'),
+    ('player_id', '<i4'), ('points', '<f4'), ('projected', '<f4'),
+], align=True)
+
+_cache = memory.Cache('players')
+
+
+def _paths(year):
+    base = os.path.join(PLAYERS_DIR, str(year))
+    return base + '.npy', base + '.json'
+
+
+def read_season(year):
+    '''(meta, rows) for a stored season, or (None, empty rows)'''
+    rows_path, meta_path = _paths(year)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        rows = np.load(rows_path, mmap_mode='r')
+    except FileNotFoundError:
+        return None, np.zeros(0, dtype=ROW_DTYPE)
+    return meta, rows
+
+
+def _season_lock(year):
+    '''Held around every read-modify-write of a stored season, across processes'''
+    return history.archive_lock(_paths(year)[0])
+
+
+def write_season(year, meta, rows):
+    os.makedirs(PLAYERS_DIR, exist_ok=True)
+    rows_path, meta_path = _paths(year)
+    suffix = f".{os.getpid()}.tmp"
+    # rows first: a sidecar never describes weeks its rows file doesn't have
+    with open(rows_path + suffix, 'wb') as f:
+        np.save(f, np.sort(rows, order=['year', 'week', 'team_id']))
+    os.replace(rows_path + suffix, rows_path)
+    with open(meta_path + suffix, 'w') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + suffix, meta_path)
+
+
+# --- Ingestion ---
+
+def _box_rows(year, week, box_scores, meta):
+    slots = meta['slots']
+    rows = []
+    for box in box_scores:
+        for team, lineup in ((box.home_team, box.home_lineup), (box.away_team, box.away_lineup)):
+            if not team or not lineup:
+                continue  # bye
+            for p in lineup:
+                if p.slot_position not in slots:
+                    slots.append(p.slot_position)
+                meta['players'][str(p.playerId)] = [p.name, p.position, list(getattr(p, 'eligibleSlots', None) or [p.position])]
+                rows.append((year, week, team.team_id, slots.index(p.slot_position), p.playerId,
+                             p.points or 0, p.projected_points or 0))
+    return np.array(rows, dtype=ROW_DTYPE)
+
+
+@tracing.traced('players.sync_season')
+def sync_season(season, league=None, league_loader=history.get_league, live=True):
+    '''Ingest the finished weeks not stored yet, plus the live week unless live is False; returns (meta, rows)'''
+    year = season['year']
+    # the check for missing weeks is under the lock too, so a second process
+    # waiting on a sync finds the weeks stored instead of fetching them again
+    with _season_lock(year):
+        meta, rows = read_season(year)
+        final, live_week = history.week_status(season)
+        done = set(meta['final_weeks']) if meta else set()
+        todo = [w for w in final if w not in done] + ([live_week] if live and live_week else [])
+        if meta and not todo:
+            return meta, rows
+
+        league = league or league_loader(year)
+        if meta is None:
+            meta = {'year': year, 'final_weeks': [], 'slots': [], 'players': {},
+                    'slot_counts': dict(league.settings.position_slot_counts)}
+        kept = [np.asarray(rows[~np.isin(rows['week'], todo)])]
+        for week in todo:
+            kept.append(_box_rows(year, week, league.box_scores(week), meta))
+
+        meta['final_weeks'] = sorted(done | set(final))
+        if live:
+            meta['live_week'] = live_week
+        elif meta.get('live_week') in todo:
+            meta['live_week'] = None  # the stored live week has just been replaced by its final rows
+        meta['synced_at'] = time.time()
+        rows = np.concatenate(kept)
+        write_season(year, meta, rows)
+        return meta, rows
+
+
+def replace_team_weeks(year, week, box_scores, team_ids):
+    '''Re-ingest some teams' rows of one stored week from fresh box scores'''
+    with _season_lock(year):
+        meta, rows = read_season(year)
+        fresh = _box_rows(year, week, box_scores, meta)
+        stale = (rows['week'] == week) & np.isin(rows['team_id'], list(team_ids))
+        replaced = fresh[np.isin(fresh['team_id'], list(team_ids))]
+        meta['synced_at'] = time.time()
+        write_season(year, meta, np.concatenate([np.asarray(rows[~stale]), replaced]))
+
+
+def sync(data, league_loader=history.get_league, live=True):
+    '''Bring every box score season of the archive up to date; returns the Warehouse
+
+    With live=False only newly finished weeks are fetched, so once they are
+    stored this makes no ESPN calls and leaves the warehouse version alone.
+    '''
+    for year in sorted(data['seasons']):
+        if year < FIRST_BOX_SCORE_SEASON:
+            continue
+        try:
+            sync_season(data['seasons'][year], league_loader=league_loader, live=live)
+        except Exception as e:
+            print(f"Failed to sync player stats for {year}: {e}")
+    return get()
+
+
+# --- Queries ---
+
+class Warehouse(object):
+    def __init__(self, seasons, version=None):
+        '''seasons: {year: (meta, rows)}; version identifies them for derived caches'''
+        self.version = version
+        self.meta = {year: meta for year, (meta, _) in seasons.items() if meta}
+        parts = [np.asarray(rows) for _, rows in seasons.values()]
+        self.rows = np.concatenate(parts) if parts else np.zeros(0, dtype=ROW_DTYPE)
+        self.rows = np.sort(self.rows, order=['year', 'week', 'team_id'])
+
+        # bench flag per row, from each season's own slot table
+        self.starter = np.ones(len(self.rows), dtype=bool)
+        for year, meta in self.meta.items():
+            bench = [i for i, s in enumerate(meta['slots']) if s in leaderboards.BENCH_SLOTS]
+            in_year = self.rows['year'] == year
+            self.starter[in_year & np.isin(self.rows['slot'], bench)] = False
+
+        # team-week index: contiguous (start, end) slices
+        keys = self._team_week_key(self.rows['year'], self.rows['week'], self.rows['team_id'])
+        uniq, start = np.unique(keys, return_index=True)
+        end = np.append(start[1:], len(keys))
+        self.team_weeks = dict(zip(uniq.tolist(), zip(start.tolist(), end.tolist())))
+
+        # player index: row numbers grouped by player, in time order
+        self.by_player = np.argsort(self.rows['player_id'], kind='stable')
+        ids, first = np.unique(self.rows['player_id'][self.by_player], return_index=True)
+        last = np.append(first[1:], len(self.by_player))
+        self.players = dict(zip(ids.tolist(), zip(first.tolist(), last.tolist())))
+
+    @staticmethod
+    def _team_week_key(year, week, team_id):
+        return (np.asarray(year, dtype=np.int64) * 100 + week) * 1000 + team_id
+
+    def seasons(self):
+        return sorted(self.meta)
+
+    def player_name(self, player_id):
+        for year in sorted(self.meta, reverse=True):
+            info = self.meta[year]['players'].get(str(player_id))
+            if info:
+                return info[0]
+        return str(player_id)
+
+    def team_week(self, year, week, team_id):
+        start, end = self.team_weeks.get(int(self._team_week_key(year, week, team_id)), (0, 0))
+        return self.rows[start:end]
+
+    def player_weeks(self, player_id):
+        start, end = self.players.get(player_id, (0, 0))
+        return self.rows[self.by_player[start:end]]
+
+    def lineup(self, year, week, team_id):
+        '''A team-week as objects shaped like box score players (see leaderboards.lineup_efficiency)'''
+        meta = self.meta[year]
+        lineup = []
+        for row in self.team_week(year, week, team_id):
+            name, position, eligible = meta['players'].get(str(row['player_id']), ['', '', []])
+            lineup.append(SimpleNamespace(playerId=int(row['player_id']), name=name, position=position,
+                                          eligibleSlots=eligible, slot_position=meta['slots'][row['slot']],
+                                          points=float(row['points']), projected_points=float(row['projected'])))
+        return lineup
+
+    def season_points(self, year):
+        '''{player_id: points over the season while on any roster}'''
+        rows = self.rows[self.rows['year'] == year]
+        # a player sits on one roster a week; count each player-week once
+        _, first = np.unique(np.stack([rows['week'].astype(np.int64), rows['player_id']], axis=1),
+                             axis=0, return_index=True)
+        rows = rows[first]
+        ids, inverse = np.unique(rows['player_id'], return_inverse=True)
+        totals = np.bincount(inverse, weights=rows['points'], minlength=len(ids))
+        return dict(zip(ids.tolist(), totals.tolist()))
+
+    def started_points(self, year=None):
+        '''{(year, team_id, player_id): points scored in starting slots}'''
+        mask = self.starter if year is None else self.starter & (self.rows['year'] == year)
+        rows = self.rows[mask]
+        keys = np.stack([rows['year'].astype(np.int64), rows['team_id'], rows['player_id']], axis=1)
+        uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=rows['points'], minlength=len(uniq))
+        return {tuple(k): float(t) for k, t in zip(uniq.tolist(), totals)}
+
+
+@tracing.traced('players.get')
+def get():
+    '''Warehouse over every stored season, cached until a season file changes'''
+    seasons = {}
+    if os.path.isdir(PLAYERS_DIR):
+        for name in os.listdir(PLAYERS_DIR):
+            if name.endswith('.json'):
+                year = int(name[:-5])
+                seasons[year] = read_season(year)
+    version = tuple(sorted((year, meta['synced_at']) for year, (meta, _) in seasons.items() if meta))
+    return _cache.get_or_set(version, lambda: Warehouse(seasons, version), clear=True)
+
+
+def season_efficiency(store, season):
+    '''{team_id: [starter points, best possible]} over a season's finished regular-season weeks'''
+    year = season['year']
+    if year not in store.meta:
+        return {}
+    slot_counts = store.meta[year]['slot_counts']
+    weeks = sorted({g['week'] for g in season['games'] if g['final'] and not g['playoff']})
+    totals = {}
+    for week in weeks:
+        for team in season['teams']:
+            lineup = store.lineup(year, week, team['team_id'])
+            if not lineup:
+                continue
+            actual, best = leaderboards.lineup_efficiency(lineup, slot_counts)
+            total = totals.setdefault(team['team_id'], [0, 0])
+            total[0] += actual
+            total[1] += best
+    return totals
+
+
+def best_pickups(data, store, n=10):
+    '''Players with the most started points for a team that didn't draft them'''
+    drafted = set()  # (year, owner_id, player_id)
+    known = set()  # seasons whose draft is stored; without it every player would count
+    for year in store.seasons():
+        record = transactions.read_season(year)
+        if record and record['draft']:
+            known.add(year)
+            drafted.update((year, pick['owner_id'], pick['player_id']) for pick in record['draft'])
+
+    owners = {(year, t['team_id']): (t['owner_id'], t['owner_name'], t['team_name'])
+              for year, s in data['seasons'].items() for t in s['teams']}
+    pickups = []
+    for (year, team_id, player_id), points in store.started_points().items():
+        owner_id, owner_name, team_name = owners.get((year, team_id), ('unknown_id', 'Unknown', ''))
+        if year not in known or (year, owner_id, player_id) in drafted:
+            continue
+        pickups.append({'year': year, 'owner': owner_name, 'team': team_name,
+                        'player': store.player_name(player_id), 'points': round(points, 2)})
+    pickups.sort(key=lambda p: -p['points'])
+    return pickups[:n]
@@ -0,0 +1,197 @@
+# Monte Carlo playoff odds for the current season
+#
+# The unplayed regular-season games are simulated many times at once: each
+# team's score is drawn from a normal distribution fitted to its scores so far,
+# standings are re-ranked the way ESPN seeds them (division winners first, then
+# record, then the league's tiebreaker) and seed counts are accumulated.
+# Results are cached per archive version.
+import math
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import history
+import memory
+import tracing
+
+SIMULATIONS = int(os.environ.get("PLAYOFF_SIMULATIONS", 20000))
+MIN_STD = 10.0  # floor so a team with a handful of similar scores isn't treated as a lock
+
+_cache = memory.Cache('playoff_odds')
+
+
+def _team_distributions(season, owners):
+    scores = {oid: [] for oid in owners}
+    for g in season['games']:
+        if g['final'] and not g['playoff']:
+            scores[g['home_id']].append(g['home_score'])
+            scores[g['away_id']].append(g['away_score'])
+
+    everything = [s for team_scores in scores.values() for s in team_scores]
+    league_mean = float(np.mean(everything)) if everything else 100.0
+    league_std = float(np.std(everything)) if len(everything) > 1 else 25.0
+
+    means = np.empty(len(owners))
+    stds = np.empty(len(owners))
+    for i, oid in enumerate(owners):
+        team_scores = scores[oid]
+        means[i] = np.mean(team_scores) if team_scores else league_mean
+        stds[i] = max(np.std(team_scores), MIN_STD) if len(team_scores) > 1 else league_std
+    return means, stds
+
+
+def _setup(season):
+    '''Arrays describing the standings so far and the games left to play'''
+    owners = [t['owner_id'] for t in season['teams']]
+    slot = {oid: i for i, oid in enumerate(owners)}
+
+    wins = np.zeros(len(owners))
+    points = np.zeros(len(owners))
+    played = []  # (home, away, home result) with results 1, 0.5 or 0
+    remaining = []
+    for g in season['games']:
+        if g['playoff']:
+            continue
+        h, a = slot[g['home_id']], slot[g['away_id']]
+        if not g['final']:
+            remaining.append((h, a))
+            continue
+        points[h] += g['home_score']
+        points[a] += g['away_score']
+        if g['home_score'] > g['away_score']:
+            result = 1
+        elif g['away_score'] > g['home_score']:
+            result = 0
+        else:
+            result = 0.5
+        wins[h] += result
+        wins[a] += 1 - result
+        played.append((h, a, result))
+
+    means, stds = _team_distributions(season, owners)
+    return {
+        'owners': owners,
+        'wins': wins,
+        'points': points,
+        'played': np.array(played, dtype=float).reshape(-1, 3),
+        'remaining': np.array(remaining, dtype=int).reshape(-1, 2),
+        # seasons archived before these were recorded seed like ESPN's default
+        'tie_rule': season.get('playoff_seed_tie_rule') or 'TOTAL_POINTS_SCORED',
+        'divisions': np.array([t.get('division_id', 0) for t in season['teams']], dtype=int),
+        'means': means,
+        'stds': stds,
+    }
+
+
+def _simulate(setup, n_sims, seed):
+    '''Seed counts: teams x seeds, from n_sims simulated finishes'''
+    rng = np.random.default_rng(seed)
+    n_teams = len(setup['owners'])
+    home, away = setup['remaining'][:, 0], setup['remaining'][:, 1]
+
+    home_scores = rng.normal(setup['means'][home], setup['stds'][home], size=(n_sims, len(home)))
+    away_scores = rng.normal(setup['means'][away], setup['stds'][away], size=(n_sims, len(away)))
+
+    wins = np.tile(setup['wins'], (n_sims, 1))
+    points = np.tile(setup['points'], (n_sims, 1))
+    rows = np.arange(n_sims)[:, None]
+    np.add.at(wins, (rows, home[None, :]), home_scores > away_scores)
+    np.add.at(wins, (rows, away[None, :]), away_scores > home_scores)
+    np.add.at(points, (rows, home[None, :]), home_scores)
+    np.add.at(points, (rows, away[None, :]), away_scores)
+
+    h2h = _h2h_wins(setup, wins, home_scores > away_scores)
+    coin = rng.random((n_sims, n_teams))
+    # np.lexsort sorts by its last key first
+    if setup['tie_rule'] == 'H2H_RECORD':
+        keys = [-coin, -points, -h2h, -wins]
+    else:
+        keys = [-coin, -h2h, -points, -wins]
+    seeds = _ranks(np.lexsort(keys, axis=1))
+
+    # division winners take the top seeds, ordered among themselves the same way
+    divisions = setup['divisions']
+    winner = np.zeros((n_sims, n_teams), dtype=bool)
+    for division in np.unique(divisions):
+        members = np.flatnonzero(divisions == division)
+        winner[rows[:, 0], members[np.argmin(seeds[:, members], axis=1)]] = True
+    seeds = _ranks(np.lexsort(keys + [~winner], axis=1))
+
+    counts = np.zeros((n_teams, n_teams), dtype=np.int64)
+    np.add.at(counts, (np.broadcast_to(np.arange(n_teams), seeds.shape), seeds), 1)
+    return counts, wins.sum(axis=0)
+
+
+def _h2h_wins(setup, wins, home_won):
+    '''Each team's wins in games against teams that finished with the same record'''
+    h2h = np.zeros_like(wins)
+    rows = np.arange(len(wins))[:, None]
+    played = setup['played']
+    home, away = played[:, 0].astype(int), played[:, 1].astype(int)
+    tied = wins[:, home] == wins[:, away]
+    np.add.at(h2h, (rows, home[None, :]), tied * played[:, 2])
+    np.add.at(h2h, (rows, away[None, :]), tied * (1 - played[:, 2]))
+    home, away = setup['remaining'][:, 0], setup['remaining'][:, 1]
+    tied = wins[:, home] == wins[:, away]
+    np.add.at(h2h, (rows, home[None, :]), tied & home_won)
+    np.add.at(h2h, (rows, away[None, :]), tied & ~home_won)
+    return h2h
+
+
+def _ranks(order):
+    '''Seed of every team (0 is the top seed) from each simulation's ordering'''
+    seeds = np.empty_like(order)
+    seeds[np.arange(len(order))[:, None], order] = np.arange(order.shape[1])[None, :]
+    return seeds
+
+
+def simulate(season, n_sims=SIMULATIONS, workers=1, seed=None):
+    '''Playoff, bye and seed probabilities for every team in the season'''
+    setup = _setup(season)
+    n_teams = len(setup['owners'])
+    if workers > 1:
+        chunks = [n_sims // workers + (1 if i < n_sims % workers else 0) for i in range(workers)]
+        seeds = np.random.SeedSequence(seed).spawn(workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate, [setup] * workers, chunks, seeds))
+        counts = sum(p[0] for p in parts)
+        total_wins = sum(p[1] for p in parts)
+    else:
+        counts, total_wins = _simulate(setup, n_sims, seed)
+
+    playoff_teams = min(season['playoff_team_count'], n_teams)
+    # top seeds skip the first round when the bracket isn't a power of two
+    byes = 2 ** math.ceil(math.log2(playoff_teams)) - playoff_teams if playoff_teams > 1 else 0
+
+    teams = {t['owner_id']: t for t in season['teams']}
+    results = []
+    for i, oid in enumerate(setup['owners']):
+        seed_pct = counts[i] / n_sims
+        results.append({
+            'owner_id': oid,
+            'owner': teams[oid]['owner_name'],
+            'team': teams[oid]['team_name'],
+            'projected_wins': round(float(total_wins[i]) / n_sims, 2),
+            'playoff_pct': round(float(seed_pct[:playoff_teams].sum()) * 100, 1),
+            'bye_pct': round(float(seed_pct[:byes].sum()) * 100, 1),
+            'seed_pct': [round(float(p) * 100, 1) for p in seed_pct],
+            'likely_seed': int(np.argmax(seed_pct)) + 1,
+        })
+    results.sort(key=lambda r: (-r['playoff_pct'], -r['projected_wins']))
+    return {
+        'year': season['year'],
+        'simulations': n_sims,
+        'games_remaining': len(setup['remaining']),
+        'playoff_teams': playoff_teams,
+        'byes': byes,
+        'teams': results,
+    }
+
+
+@tracing.traced('playoff_odds.current_odds')
+def current_odds(data, year=history.SEASON_YEAR, n_sims=SIMULATIONS, workers=1):
+    '''Cached odds for the given season, or None if it isn't in the archive'''
+    season = data['seasons'].get(year)
+    if season is None:
+        return None
+    key = (history.data_version(data), year, n_sims)
+    return _cache.get_or_set(key, lambda: simulate(season, n_sims=n_sims, workers=workers), clear=True)
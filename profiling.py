@@ -0,0 +1,127 @@
+# Opt-in sampling profiler
+#
+# A background thread samples the Python stack of the profiled thread (or of
+# every thread) every INTERVAL seconds and counts identical stacks. The result
+# is written in the collapsed-stack format ("outer;inner;leaf count" per line)
+# that flamegraph.pl, speedscope and inferno read, to DATA_DIR/profiles/.
+#
+# Flask routes are only hooked when PROFILE_SECRET is set; a request then opts
+# in with ?profile=<secret> or an X-Profile: <secret> header and gets the file
+# name back in X-Profile-File. Without the secret nothing is installed, so
+# requests pay nothing. export_to_sheets.py --profile profiles a whole export.
+import os
+import sys
+import hmac
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import history
+
+PROFILES_DIR = os.path.join(history.DATA_DIR, "profiles")
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET")
+INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.001))  # seconds between samples
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ',')
+
+
+def _stack(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(object):
+    '''Counts the stacks of one thread (thread_id) or of every other thread (None)'''
+
+    def __init__(self, thread_id=None, interval=INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frames = {self.thread_id: frames[self.thread_id]} if self.thread_id in frames else {}
+            else:
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident == me:
+                    continue
+                stack = _stack(frame)
+                if self.thread_id is None:
+                    stack = f"{names.get(ident, ident)};{stack}"
+                self.stacks[stack] += 1
+            self.samples += 1
+
+    def start(self):
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.time() - self.started
+        return self
+
+    def write(self, name):
+        '''Write the collapsed stacks to PROFILES_DIR and return the path'''
+        os.makedirs(PROFILES_DIR, exist_ok=True)
+        path = os.path.join(PROFILES_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.folded")
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+@contextmanager
+def profile(name):
+    '''Profile every thread for the duration of the block'''
+    sampler = Sampler().start()
+    try:
+        yield sampler
+    finally:
+        path = sampler.stop().write(name)
+        print(f"Profile of {name} ({sampler.samples} samples over {sampler.elapsed:.1f}s) written to {path}")
+
+
+# --- Flask ---
+
+def install(app, secret=PROFILE_SECRET):
+    '''Hook per-request profiling into app; does nothing unless a secret is configured'''
+    if not secret:
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        token = request.args.get('profile') or request.headers.get('X-Profile')
+        if token and hmac.compare_digest(token, secret):
+            g.profiler = Sampler(threading.get_ident()).start()
+
+    @app.after_request
+    def _finish_profile(response):
+        sampler = g.pop('profiler', None)
+        if sampler is not None:
+            name = (request.endpoint or 'request').replace('.', '_')
+            response.headers['X-Profile-File'] = os.path.basename(sampler.stop().write(name))
+        return response
+
+    @app.teardown_request
+    def _abandon_profile(error):
+        # a request that raised never reaches after_request
+        sampler = g.pop('profiler', None)
+        if sampler is not None:
+            sampler.stop()
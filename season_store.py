@@ -0,0 +1,284 @@
+# Memory-mapped season store shared by all gunicorn workers
+#
+# The JSON archive is compiled into one binary file of fixed-width records
+# (seasons, teams, games) plus a string table. Only the worker that finds it
+# missing or stale talks to ESPN (under a file lock) while the others wait and
+# map the result. Pages read the dict archive from to_history(), which decodes
+# the mapped records once per worker and store build, so every worker still
+# holds its own copy of the decoded seasons: what the store shares is the ESPN
+# fetch and the compiled file, not the decoded data.
+#
+# Layout: header | seasons | teams | games | string offsets | string bytes,
+# each section aligned to 8 bytes.
+import os
+import mmap
+import time
+import fcntl
+import json
+import struct
+import numpy as np
+import history
+import tracing
+import memory
+
+STORE_PATH = os.path.join(history.DATA_DIR, "seasons.bin")
+
+MAGIC = b"FFSS"
+FORMAT_VERSION = 4
+HEADER = struct.Struct("<4sHHIIII")  # magic, version, reserved, seasons, teams, games, strings
+
+# align=True pads every field to its natural boundary
+SEASON_DTYPE = np.dtype([
+    ('year', '<i2'), ('reg_season_count', '<i2'), ('playoff_team_count', '<i2'), ('complete', 'u1'),
+    ('format', 'u1'),  # history.ARCHIVE_FORMAT the season was fetched under
+    ('playoff_seed_tie_rule', '<i4'), ('fetched_at', '<f8'),
+    ('team_start', '<i4'), ('team_count', '<i4'), ('game_start', '<i4'), ('game_count', '<i4'),
+], align=True)
+TEAM_DTYPE = np.dtype([
+    ('team_id', '<i4'), ('owner_id', '<i4'), ('owner_name', '<i4'), ('team_name', '<i4'), ('logo', '<i4'),
+    ('co_owners', '<i4'),  # JSON list in the string table
+    ('division_id', '<i2'),
+    ('wins', '<i2'), ('losses', '<i2'), ('ties', '<i2'), ('standing', '<i2'), ('final_standing', '<i2'),
+    ('points_for', '<f8'), ('points_against', '<f8'),
+], align=True)
+GAME_DTYPE = np.dtype([
+    ('year', '<i2'), ('week', '<i2'), ('playoff', 'u1'), ('final', 'u1'),
+    ('home_id', '<i4'), ('away_id', '<i4'), ('home_score', '<f8'), ('away_score', '<f8'),
+], align=True)
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _layout(n_seasons, n_teams, n_games, n_strings):
+    '''Byte offset of every section for the given record counts'''
+    offsets = {}
+    pos = _align(HEADER.size)
+    for name, size in (('seasons', n_seasons * SEASON_DTYPE.itemsize),
+                       ('teams', n_teams * TEAM_DTYPE.itemsize),
+                       ('games', n_games * GAME_DTYPE.itemsize),
+                       ('string_offsets', (n_strings + 1) * 4)):
+        offsets[name] = pos
+        pos = _align(pos + size)
+    offsets['strings'] = pos
+    return offsets
+
+
+# --- Writing ---
+
+def write_store(data, path=STORE_PATH):
+    strings = {}
+
+    def intern(s):
+        if s not in strings:
+            strings[s] = len(strings)
+        return strings[s]
+
+    years = sorted(data['seasons'])
+    n_teams = sum(len(data['seasons'][y]['teams']) for y in years)
+    n_games = sum(len(data['seasons'][y]['games']) for y in years)
+    seasons = np.zeros(len(years), dtype=SEASON_DTYPE)
+    teams = np.zeros(n_teams, dtype=TEAM_DTYPE)
+    games = np.zeros(n_games, dtype=GAME_DTYPE)
+
+    t = g = 0
+    for i, year in enumerate(years):
+        season = data['seasons'][year]
+        # seasons archived before seeding rules and divisions were recorded have neither
+        seasons[i] = (year, season['reg_season_count'], season['playoff_team_count'], season['complete'],
+                      season.get('format', 1), intern(season.get('playoff_seed_tie_rule') or ''), season['fetched_at'],
+                      t, len(season['teams']), g, len(season['games']))
+        for team in season['teams']:
+            teams[t] = (team['team_id'], intern(team['owner_id']), intern(team['owner_name']),
+                        intern(team['team_name']), intern(team['logo'] or ''),
+                        intern(json.dumps(team.get('co_owners', []))), team.get('division_id', 0),
+                        team['wins'], team['losses'], team['ties'], team['standing'], team['final_standing'],
+                        team['points_for'], team['points_against'])
+            t += 1
+        for game in season['games']:
+            games[g] = (game['year'], game['week'], game['playoff'], game['final'],
+                        intern(game['home_id']), intern(game['away_id']), game['home_score'], game['away_score'])
+            g += 1
+
+    encoded = [s.encode('utf-8') for s in strings]
+    string_offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+    string_offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    offsets = _layout(len(seasons), len(teams), len(games), len(encoded))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(seasons), len(teams), len(games), len(encoded)))
+        for name, array in (('seasons', seasons), ('teams', teams), ('games', games),
+                            ('string_offsets', string_offsets)):
+            f.seek(offsets[name])
+            f.write(array.tobytes())
+        f.seek(offsets['strings'])
+        f.write(b''.join(encoded))
+    # replace rather than rewrite so workers still mapping the old file keep a valid view
+    os.replace(tmp, path)
+
+
+# --- Reading ---
+
+_decoded = memory.Cache('archive')  # (path, inode, built_at) -> decoded archive
+
+
+class SeasonStore(object):
+    '''Read-only numpy views over a mapped store file'''
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.inode = stat.st_ino
+            self.built_at = stat.st_mtime
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _, n_seasons, n_teams, n_games, n_strings = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a season store (format {version})")
+
+        offsets = _layout(n_seasons, n_teams, n_games, n_strings)
+        self.seasons = np.frombuffer(self._map, SEASON_DTYPE, n_seasons, offsets['seasons'])
+        self.teams = np.frombuffer(self._map, TEAM_DTYPE, n_teams, offsets['teams'])
+        self.games = np.frombuffer(self._map, GAME_DTYPE, n_games, offsets['games'])
+        self._string_offsets = np.frombuffer(self._map, '<u4', n_strings + 1, offsets['string_offsets'])
+        self._strings_at = offsets['strings']
+
+    def string(self, idx):
+        start = self._strings_at + int(self._string_offsets[idx])
+        end = self._strings_at + int(self._string_offsets[idx + 1])
+        return self._map[start:end].decode('utf-8')
+
+    def replaced(self):
+        '''True once a newer store has been written over this one'''
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return True
+
+    def is_stale(self, seasons=history.SEASONS):
+        '''An unfinished, missing (failed to fetch) or old-format season and the store was built over CURRENT_TTL ago'''
+        unfinished = (not self.seasons['complete'].all() or not self.covers(seasons)
+                      or (self.seasons['format'] < history.ARCHIVE_FORMAT).any())
+        return unfinished and time.time() - self.built_at > history.CURRENT_TTL
+
+    def covers(self, seasons):
+        return set(seasons) <= set(int(y) for y in self.seasons['year'])
+
+    def to_history(self):
+        '''The archive in the same shape history.load_history() returns
+
+        The decoded dicts are private to each worker, unlike the mapped
+        arrays, so they are counted against the worker's memory budget and
+        decoded again if evicted.
+        '''
+        key = (self.path, self.inode, self.built_at)
+        decoded = _decoded.get(key)
+        if decoded is not None:
+            return decoded
+
+        s = self.string
+        seasons = {}
+        for row in self.seasons:
+            team_rows = self.teams[row['team_start']:row['team_start'] + row['team_count']]
+            game_rows = self.games[row['game_start']:row['game_start'] + row['game_count']]
+            seasons[int(row['year'])] = {
+                'year': int(row['year']),
+                'fetched_at': float(row['fetched_at']),
+                'complete': bool(row['complete']),
+                'format': int(row['format']),
+                'reg_season_count': int(row['reg_season_count']),
+                'playoff_team_count': int(row['playoff_team_count']),
+                'playoff_seed_tie_rule': s(row['playoff_seed_tie_rule']) or None,
+                'teams': [{
+                    'team_id': int(t['team_id']),
+                    'owner_id': s(t['owner_id']),
+                    'owner_name': s(t['owner_name']),
+                    'co_owners': json.loads(s(t['co_owners'])),
+                    'team_name': s(t['team_name']),
+                    'division_id': int(t['division_id']),
+                    'logo': s(t['logo']),
+                    'wins': int(t['wins']),
+                    'losses': int(t['losses']),
+                    'ties': int(t['ties']),
+                    'points_for': float(t['points_for']),
+                    'points_against': float(t['points_against']),
+                    'standing': int(t['standing']),
+                    'final_standing': int(t['final_standing']),
+                } for t in team_rows],
+                'games': [{
+                    'year': int(g['year']),
+                    'week': int(g['week']),
+                    'home_id': s(g['home_id']),
+                    'away_id': s(g['away_id']),
+                    'home_score': float(g['home_score']),
+                    'away_score': float(g['away_score']),
+                    'playoff': bool(g['playoff']),
+                    'final': bool(g['final']),
+                } for g in game_rows],
+            }
+        decoded = {
+            'seasons': seasons,
+            'h2h_index': history.build_h2h_index([seasons[y] for y in sorted(seasons)]),
+        }
+        # only the current store's decoding is worth keeping
+        _decoded.clear()
+        _decoded[key] = decoded
+        return decoded
+
+
+def _open_if_usable(path, seasons):
+    try:
+        store = SeasonStore(path)
+    except (FileNotFoundError, ValueError):
+        return None
+    # a season that failed to fetch is retried on the normal TTL, not by every worker that maps the store
+    if store.is_stale(seasons):
+        return None
+    return store
+
+
+_store = None
+
+
+def publish(data, path=STORE_PATH):
+    '''Rebuild the store from already loaded data; mapped workers see replaced() and remap'''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            write_store(data, path)
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def mapped():
+    '''The store this process has mapped, if any, without checking or rebuilding it'''
+    return _store
+
+
+def current(seasons=history.SEASONS, path=STORE_PATH):
+    '''The mapped store, rebuilt first by exactly one process when missing or stale'''
+    global _store
+    if _store is not None and not _store.replaced() and not _store.is_stale(seasons):
+        return _store
+
+    store = _open_if_usable(path, seasons)
+    if store is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # another worker may have rebuilt it while we waited for the lock
+                store = _open_if_usable(path, seasons)
+                if store is None:
+                    with tracing.span('season_store.rebuild'):
+                        write_store(history.load_history(seasons, refresh=True), path)
+                    store = SeasonStore(path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    _store = store
+    return _store
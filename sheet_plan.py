@@ -0,0 +1,182 @@
+# Spreadsheet write planner
+#
+# Tab builders only describe a tab (its values plus header rows, frozen rows,
+# conditional formats and charts) as plain JSON-able data. apply() turns all
+# of the tabs into one spreadsheets.batchUpdate for the structure / formatting
+# and one values.batchUpdate for the cells, after a single metadata read to
+# find the sheets that already exist - three API calls for a whole export, no
+# matter how many tabs or rows. update() compares the tabs with the ones
+# written last time and sends only the rows that changed, in one values
+# request, rewriting a tab in full only when its layout changed.
+import json
+import tracing
+
+MIN_ROWS = 50
+SPARE_ROWS = 20
+HEADER_FORMAT = {"textFormat": {"bold": True}, "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9}}
+METADATA_FIELDS = "sheets(properties(sheetId,title),conditionalFormats,charts(chartId))"
+
+
+def tab(title, rows, header_rows=(), frozen_rows=0, conditional=(), charts=()):
+    '''Description of one tab; rows are written from A1
+
+    conditional: [{'range': [first row, last row, first col, last col], 'formula': ..., 'color': {...}}]
+    charts: [{'title', 'type', 'domain_col', 'series_cols', 'rows', 'x_title', 'y_title'}]
+    Row / column numbers are zero based, ranges end-exclusive.
+    '''
+    return {
+        'title': title,
+        'rows': rows,
+        'header_rows': list(header_rows),
+        'frozen_rows': frozen_rows,
+        'conditional': list(conditional),
+        'charts': list(charts),
+    }
+
+
+def _grid(sheet_id, first_row, last_row, first_col, last_col):
+    return {"sheetId": sheet_id, "startRowIndex": first_row, "endRowIndex": last_row,
+            "startColumnIndex": first_col, "endColumnIndex": last_col}
+
+
+def _chart(sheet_id, chart, anchor_row):
+    rows = chart['rows']
+    return {"addChart": {"chart": {
+        "spec": {
+            "title": chart['title'],
+            "basicChart": {
+                "chartType": chart.get('type', 'LINE'),
+                "legendPosition": "RIGHT_LEGEND",
+                "headerCount": 1,
+                "axis": [{"position": "BOTTOM_AXIS", "title": chart.get('x_title', '')},
+                         {"position": "LEFT_AXIS", "title": chart.get('y_title', '')}],
+                "domains": [{"domain": {"sourceRange": {"sources": [
+                    _grid(sheet_id, 0, rows, chart['domain_col'], chart['domain_col'] + 1)]}}}],
+                "series": [{"series": {"sourceRange": {"sources": [_grid(sheet_id, 0, rows, col, col + 1)]}},
+                            "targetAxis": "LEFT_AXIS"} for col in chart['series_cols']],
+            }
+        },
+        "position": {"overlayPosition": {"anchorCell": {"sheetId": sheet_id, "rowIndex": anchor_row, "columnIndex": 0}}}
+    }}}
+
+
+def plan(metadata, tabs):
+    '''(spreadsheets.batchUpdate body, values.batchUpdate body) for writing tabs'''
+    existing = {s['properties']['title']: s for s in metadata.get('sheets', [])}
+    next_id = max([s['properties']['sheetId'] for s in existing.values()] + [0]) + 1
+    requests = []
+    data = []
+
+    for t in tabs:
+        rows = t['rows']
+        row_count = max(MIN_ROWS, len(rows) + SPARE_ROWS)
+        col_count = max([len(r) for r in rows] + [1])
+        grid = {"rowCount": row_count, "columnCount": col_count, "frozenRowCount": t['frozen_rows']}
+
+        sheet = existing.get(t['title'])
+        if sheet is None:
+            sheet_id = next_id
+            next_id += 1
+            requests.append({"addSheet": {"properties": {"sheetId": sheet_id, "title": t['title'],
+                                                         "gridProperties": grid}}})
+        else:
+            # reuse the sheet: resize it and drop its old values, formats, rules and charts
+            sheet_id = sheet['properties']['sheetId']
+            requests.append({"updateSheetProperties": {
+                "properties": {"sheetId": sheet_id, "gridProperties": grid},
+                "fields": "gridProperties(rowCount,columnCount,frozenRowCount)"}})
+            requests.append({"updateCells": {"range": {"sheetId": sheet_id}, "fields": "*"}})
+            for _ in sheet.get('conditionalFormats', []):
+                requests.append({"deleteConditionalFormatRule": {"sheetId": sheet_id, "index": 0}})
+            for chart in sheet.get('charts', []):
+                requests.append({"deleteEmbeddedObject": {"objectId": chart['chartId']}})
+
+        for r in t['header_rows']:
+            requests.append({"repeatCell": {
+                "range": _grid(sheet_id, r, r + 1, 0, max(1, len(rows[r]))),
+                "cell": {"userEnteredFormat": HEADER_FORMAT},
+                "fields": "userEnteredFormat(textFormat,backgroundColor)"}})
+        for rule in t['conditional']:
+            requests.append({"addConditionalFormatRule": {"index": 0, "rule": {
+                "ranges": [_grid(sheet_id, *rule['range'])],
+                "booleanRule": {"condition": {"type": "CUSTOM_FORMULA",
+                                              "values": [{"userEnteredValue": rule['formula']}]},
+                                "format": {"backgroundColor": rule['color']}}}}})
+        for chart in t['charts']:
+            requests.append(_chart(sheet_id, chart, len(rows) + 1))
+
+        if rows:
+            quoted = t['title'].replace("'", "''")
+            data.append({"range": f"'{quoted}'!A1", "values": rows})
+
+    return {"requests": requests}, {"valueInputOption": "RAW", "data": data}
+
+
+def _layout(t):
+    '''Everything about a tab but its values; a change here needs a full rewrite'''
+    return {key: value for key, value in t.items() if key != 'rows'}
+
+
+def changed_rows(previous, t):
+    '''Value ranges covering the rows of t that differ from previous, or None if t must be rewritten'''
+    if previous is None:
+        return None
+    # compare as they were stored: tuples read back as lists
+    t = json.loads(json.dumps(t))
+    if _layout(previous) != _layout(t):
+        return None
+    old, new = previous['rows'], t['rows']
+    # the sheet was sized for the old rows when it was written in full
+    if (len(new) > max(MIN_ROWS, len(old) + SPARE_ROWS)
+            or max([len(r) for r in new] + [1]) > max([len(r) for r in old] + [1])):
+        return None
+
+    quoted = t['title'].replace("'", "''")
+    ranges = []
+    for i in range(max(len(old), len(new))):
+        before = old[i] if i < len(old) else []
+        after = new[i] if i < len(new) else []
+        if before == after:
+            continue
+        # blank the cells a shorter row no longer covers
+        values = list(after) + [""] * (len(before) - len(after))
+        if ranges and ranges[-1]['end'] == i:
+            ranges[-1]['values'].append(values)
+            ranges[-1]['end'] = i + 1
+        else:
+            ranges.append({'start': i, 'end': i + 1, 'values': [values]})
+    return [{"range": f"'{quoted}'!A{r['start'] + 1}", "values": r['values']} for r in ranges]
+
+
+def update(sh, tabs, previous):
+    '''Write what changed since previous ({title: tab} as last written); returns the tabs rewritten in full'''
+    rewrite = []
+    data = []
+    for t in tabs:
+        ranges = changed_rows(previous.get(t['title']), t)
+        if ranges is None:
+            rewrite.append(t)
+        else:
+            data.extend(ranges)
+    if rewrite:
+        apply(sh, rewrite)
+    if data:
+        with tracing.span('sheets.values_update', ranges=len(data),
+                          cells=sum(len(row) for d in data for row in d['values'])):
+            sh.values_batch_update({"valueInputOption": "RAW", "data": data})
+    return [t['title'] for t in rewrite]
+
+
+def apply(sh, tabs):
+    '''Write every tab with one metadata read and two batch requests'''
+    with tracing.span('sheets.metadata'):
+        metadata = sh.fetch_sheet_metadata(params={"fields": METADATA_FIELDS})
+    structure, values = plan(metadata, tabs)
+    if structure['requests']:
+        with tracing.span('sheets.batch_update', requests=len(structure['requests']),
+                          bytes=len(json.dumps(structure))):
+            sh.batch_update(structure)
+    if values['data']:
+        with tracing.span('sheets.values_update', ranges=len(values['data']),
+                          cells=sum(len(row) for d in values['data'] for row in d['values'])):
+            sh.values_batch_update(values)
@@ -0,0 +1,103 @@
+# Single-flight call coalescing
+#
+# do(key, fn) runs fn once for any number of concurrent callers asking for the
+# same key; the others wait and get the same result (or exception). Nothing is
+# cached once the flight lands - the next caller starts a new flight.
+#
+# With shared=<name> the flight also spans gunicorn workers: the leader holds
+# an flock on DATA_DIR/flights/<name>.lock and pickles its key and result next
+# to it behind a generation number. A worker notes the generation before
+# waiting on the lock; if it went up by the time the lock is free and the
+# landed flight was for the same key, that result is picked up instead of
+# recomputing. Every key of a name shares the two files, so keys that embed a
+# data version don't leave a pair behind per version.
+import os
+import fcntl
+import pickle
+import threading
+import history
+
+FLIGHTS_DIR = os.path.join(history.DATA_DIR, "flights")
+
+
+class _Flight(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def do(key, fn, shared=None):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    try:
+        flight.result = _shared_call(shared, key, fn) if shared else fn()
+        return flight.result
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+
+def _generation(f):
+    '''Generation number at the head of an open result file'''
+    try:
+        return pickle.load(f)
+    except (pickle.UnpicklingError, EOFError):
+        return 0
+
+
+def _read_generation(path):
+    try:
+        with open(path, 'rb') as f:
+            return _generation(f)
+    except FileNotFoundError:
+        return 0
+
+
+def _shared_call(name, key, fn):
+    lock_path = os.path.join(FLIGHTS_DIR, name + '.lock')
+    result_path = os.path.join(FLIGHTS_DIR, name + '.pkl')
+    os.makedirs(FLIGHTS_DIR, exist_ok=True)
+
+    seen = _read_generation(result_path)
+    with open(lock_path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # another worker's flight may have landed while we waited
+            generation = 0
+            try:
+                with open(result_path, 'rb') as f:
+                    generation = _generation(f)
+                    if generation > seen and pickle.load(f) == key:
+                        return pickle.load(f)
+            except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+                pass
+
+            result = fn()
+            tmp = f"{result_path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(generation + 1, f)
+                pickle.dump(key, f)
+                pickle.dump(result, f)
+            os.replace(tmp, result_path)
+            return result
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
@@ -0,0 +1,108 @@
+# Pre-rendered static copy of the dashboard
+#
+# Renders the dashboard pages through the Flask app into SITE_DIR, one
+# <path>/index.html per page, so the site can be served by any static host and
+# Flask is only needed for live / filtered views (query strings, the JSON API).
+# Every page is recorded in a manifest with the inputs it was rendered from;
+# a page whose inputs haven't changed since the last build is not rendered
+# again. Run with: python static_site.py [--force]
+import os
+import sys
+import json
+import hashlib
+from urllib.parse import unquote
+from flask import url_for
+import history
+import app
+import h2h
+import players
+import assets
+
+SITE_DIR = os.environ.get("STATIC_SITE_DIR", os.path.join(history.DATA_DIR, "site"))
+MANIFEST = ".manifest.json"
+
+
+def pages(data):
+    '''(url path, inputs fingerprint) for every page in the static site'''
+    # every page links the asset bundles, so a new bundle means new pages
+    version = repr((history.data_version(data), assets.version()))
+    # the standings page also shows the live league object app.py serves
+    league = app.home_league()
+    live = repr((version, league.year, getattr(league, 'current_week', None)))
+
+    yield '/', live
+    yield '/headtohead', version
+    yield '/records', version
+    yield '/playoffs', version
+    yield '/trends', version
+    store = players.get()
+    yield '/draft', repr((version, sorted((y, m['synced_at']) for y, m in store.meta.items())))
+
+    owner_ids, _ = h2h.get(data).table()
+    with app.app.test_request_context():
+        rivalries = [url_for('rivalry', owner_a=a, owner_b=b) for a in owner_ids for b in owner_ids if a != b]
+    for path in rivalries:
+        yield path, version
+
+
+def page_file(site_dir, path):
+    # static hosts decode the request path before looking up the file
+    return os.path.join(site_dir, unquote(path).strip('/'), 'index.html')
+
+
+def read_manifest(site_dir):
+    try:
+        with open(os.path.join(site_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def build(site_dir=SITE_DIR, force=False):
+    '''Render every page whose inputs changed; returns (rendered, skipped) paths'''
+    data = app.get_history()
+    manifest = read_manifest(site_dir)
+    client = app.app.test_client()
+    rendered, skipped = [], []
+
+    for path, inputs in pages(data):
+        target = page_file(site_dir, path)
+        entry = manifest.get(path)
+        if not force and entry and entry['inputs'] == inputs and os.path.exists(target):
+            skipped.append(path)
+            continue
+
+        response = client.get(path)
+        if response.status_code != 200:
+            print(f"Skipping {path}: HTTP {response.status_code}")
+            continue
+        body = response.get_data()
+        digest = hashlib.sha1(body).hexdigest()
+        # same output from new inputs: keep the file (and its mtime) as is
+        if not (entry and entry['sha1'] == digest and os.path.exists(target)):
+            write_file(target, body)
+        manifest[path] = {'inputs': inputs, 'sha1': digest}
+        rendered.append(path)
+
+    # the bundles the pages link, with their precompressed copies
+    for name in assets.files():
+        target = os.path.join(site_dir, 'assets', name)
+        if not os.path.exists(target):
+            with open(os.path.join(assets.ASSETS_DIR, name), 'rb') as f:
+                write_file(target, f.read())
+
+    write_file(os.path.join(site_dir, MANIFEST), json.dumps(manifest, indent=1).encode('utf-8'))
+    return rendered, skipped
+
+
+if __name__ == '__main__':
+    rendered, skipped = build(force='--force' in sys.argv)
+    print(f"Rendered {len(rendered)} pages, {len(skipped)} unchanged, into {SITE_DIR}")
@@ -0,0 +1,35 @@
+import h2h
+
+
+def _team(team_id, owner_id, co_owners=()):
+    return {'team_id': team_id, 'owner_id': owner_id, 'owner_name': owner_id, 'team_name': f"Team {team_id}",
+            'logo': '', 'co_owners': [{'id': c, 'name': c} for c in co_owners]}
+
+
+def _game(year, week, home_id, away_id, home_score, away_score):
+    return {'year': year, 'week': week, 'home_id': home_id, 'away_id': away_id, 'home_score': home_score,
+            'away_score': away_score, 'playoff': False, 'final': True}
+
+
+def _season(year, teams, games):
+    return {'year': year, 'fetched_at': float(year), 'complete': True, 'teams': teams, 'games': games}
+
+
+def test_reused_season_follows_owner_keys_split_by_a_later_season():
+    seasons = {
+        # Bob co-owns Ann's team, then takes it over
+        2021: _season(2021, [_team(1, 'Ann', ['Bob']), _team(2, 'Cal')], [_game(2021, 1, 'Ann', 'Cal', 90, 80)]),
+        2022: _season(2022, [_team(1, 'Bob'), _team(2, 'Dee')], [_game(2022, 1, 'Bob', 'Dee', 100, 90)]),
+    }
+    before = h2h.HeadToHead({'seasons': dict(seasons)})
+
+    # Ann and Bob run rival teams, so they no longer share a key
+    seasons[2023] = _season(2023, [_team(1, 'Ann'), _team(2, 'Bob')], [_game(2023, 1, 'Ann', 'Bob', 80, 70)])
+    reused = h2h.HeadToHead({'seasons': dict(seasons)}, previous=before)
+    fresh = h2h.HeadToHead({'seasons': dict(seasons)})
+
+    assert reused.table(2022, 2022) == fresh.table(2022, 2022)
+    owner_ids, table = reused.table(2022, 2022)
+    assert {row['owner_id']: row['record'] for row in table}['Bob']['Dee'] == '1-0'
+    for year in seasons:
+        assert (reused.matrices[year] == fresh.matrices[year]).all()
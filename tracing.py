@@ -0,0 +1,220 @@
+# Structured trace log
+#
+# Work is recorded as nested spans - a route, an ESPN request, a Sheets call,
+# an aggregation stage - each written as one JSON line to TRACE_LOG when it
+# ends: name, trace / span / parent ids, start time, duration, attributes
+# (sizes, status codes, cache hits and misses) and the error if it raised.
+# Spans opened while another is active on the same thread become its
+# children, so a slow route can be followed down to the ESPN call behind it.
+# Every line carries the release, so stage timings can be compared across
+# deploys: python tracing.py [trace file] prints per-stage percentiles.
+import os
+import sys
+import json
+import time
+import uuid
+import fcntl
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+import history
+
+TRACE_LOG = os.environ.get("TRACE_LOG")  # default DATA_DIR/trace.jsonl; empty disables tracing
+MAX_BYTES = int(float(os.environ.get("TRACE_MAX_MB", 50)) * 2 ** 20)  # rotated to <file>.1 past this
+RELEASE = os.environ.get("RELEASE") or os.environ.get("RENDER_GIT_COMMIT", "")[:12] or None
+
+_current = contextvars.ContextVar('span', default=None)
+_lock = threading.Lock()
+_fd = None
+_fd_pid = None
+
+
+def _path():
+    return os.path.join(history.DATA_DIR, "trace.jsonl") if TRACE_LOG is None else TRACE_LOG
+
+
+def _open(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+def _current_inode(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _write(record):
+    global _fd, _fd_pid
+    path = _path()
+    if not path:
+        return
+    line = (json.dumps(record, default=str) + '\n').encode('utf-8')
+    with _lock:
+        # reopen after a fork (gunicorn workers) so each process has its own descriptor,
+        # and after another process rotated the file out from under this one
+        if _fd is not None and (_fd_pid != os.getpid() or _current_inode(path) != os.fstat(_fd).st_ino):
+            if _fd_pid == os.getpid():
+                os.close(_fd)
+            _fd = None
+        if _fd is None:
+            _fd = _open(path)
+            _fd_pid = os.getpid()
+        elif os.fstat(_fd).st_size > MAX_BYTES:
+            # one process rotates; the others see the new inode on their next write
+            with open(path + '.lock', 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    if _current_inode(path) == os.fstat(_fd).st_ino:
+                        os.replace(path, path + '.1')
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+            os.close(_fd)
+            _fd = _open(path)
+        # one write per line, so lines from concurrent workers never interleave
+        os.write(_fd, line)
+
+
+class Span(object):
+    def __init__(self, name, parent, attrs):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+def current():
+    '''The active span on this thread, or None'''
+    return _current.get()
+
+
+def annotate(**attrs):
+    '''Add attributes to the active span, if any'''
+    span = _current.get()
+    if span is not None:
+        span.attrs.update(attrs)
+
+
+def cache_outcome(cache, hit):
+    '''Count a cache lookup on the active span'''
+    span = _current.get()
+    if span is not None:
+        key = 'cache_hits' if hit else 'cache_misses'
+        span.attrs.setdefault(key, []).append(cache)
+
+
+def start(name, **attrs):
+    '''Open a span and make it current; pair with finish()'''
+    span = Span(name, _current.get(), attrs)
+    span.token = _current.set(span)
+    span.started = time.time()
+    span.clock = time.perf_counter()
+    return span
+
+
+def finish(span, error=None):
+    duration = time.perf_counter() - span.clock
+    try:
+        _current.reset(span.token)
+    except ValueError:
+        # finished from a different context than it was started in (Flask teardown)
+        _current.set(None)
+    record = {
+        'name': span.name, 'trace': span.trace_id, 'span': span.span_id, 'parent': span.parent_id,
+        'start': round(span.started, 6), 'ms': round(duration * 1000, 3),
+        'pid': os.getpid(), 'thread': threading.current_thread().name, 'release': RELEASE,
+    }
+    if span.attrs:
+        record['attrs'] = span.attrs
+    if error is not None:
+        record['error'] = f"{type(error).__name__}: {error}"
+    _write(record)
+
+
+@contextmanager
+def span(name, **attrs):
+    s = start(name, **attrs)
+    try:
+        yield s
+    except BaseException as e:
+        finish(s, e)
+        raise
+    finish(s)
+
+
+def traced(name):
+    '''Decorator: run the function inside a span called name'''
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# --- Flask ---
+
+def install(app):
+    '''One span per request, parent of everything the route does'''
+    from flask import g, request
+
+    @app.before_request
+    def _start_route():
+        g.trace_span = start('route', method=request.method, path=request.path)
+
+    @app.after_request
+    def _route_response(response):
+        s = g.get('trace_span')
+        if s is not None:
+            s.set(route=request.url_rule.rule if request.url_rule else None, status=response.status_code,
+                  bytes=response.calculate_content_length())
+            response.headers['X-Trace-Id'] = s.trace_id
+        return response
+
+    @app.teardown_request
+    def _finish_route(error):
+        s = g.pop('trace_span', None)
+        if s is not None:
+            finish(s, error)
+
+
+# --- Summary ---
+
+def read(path):
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def summarize(records):
+    '''{(release, stage): count, p50 / p95 / max ms}, routes split by route'''
+    import numpy as np
+    groups = {}
+    for r in records:
+        stage = r['name']
+        if stage == 'route':
+            stage = f"route {(r.get('attrs') or {}).get('route')}"
+        groups.setdefault((r.get('release'), stage), []).append(r['ms'])
+    summary = {}
+    for key, ms in groups.items():
+        ms = np.array(ms)
+        summary[key] = {'count': len(ms), 'p50': float(np.percentile(ms, 50)),
+                        'p95': float(np.percentile(ms, 95)), 'max': float(ms.max())}
+    return summary
+
+
+if __name__ == '__main__':
+    summary = summarize(read(sys.argv[1] if len(sys.argv) > 1 else _path()))
+    print(f"{'release':<14}{'stage':<40}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}")
+    for (release, stage), s in sorted(summary.items(), key=lambda kv: (str(kv[0][0]), -kv[1]['p95'])):
+        print(f"{str(release):<14}{stage:<40}{s['count']:>7}{s['p50']:>11.1f}{s['p95']:>11.1f}{s['max']:>11.1f}")
@@ -0,0 +1,144 @@
+# Draft picks and transaction activity, stored per season
+#
+# The league's activity feed is paged through once and written to
+# DATA_DIR/transactions/<year>.json together with the draft and final rosters.
+# Later syncs stop paging as soon as they reach the saved cursor (the newest
+# activity date already stored), so a weekly run costs one or two requests.
+import os
+import json
+import time
+from collections import Counter, defaultdict
+import history
+import tracing
+
+TRANSACTIONS_DIR = os.path.join(history.DATA_DIR, "transactions")
+PAGE_SIZE = 100
+PICKUP_ACTIONS = ('FA ADDED', 'WAIVER ADDED')
+FIRST_ACTIVITY_SEASON = 2019  # ESPN has no activity feed before this
+
+
+def _path(year):
+    return os.path.join(TRANSACTIONS_DIR, f"{year}.json")
+
+
+def read_season(year):
+    try:
+        with open(_path(year)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def stored_at(year):
+    '''mtime of the stored season, or None; lets derived caches notice a sync'''
+    try:
+        return os.path.getmtime(_path(year))
+    except FileNotFoundError:
+        return None
+
+
+def _season_lock(year):
+    '''Held around every read-modify-write of a stored season, across processes'''
+    return history.archive_lock(_path(year))
+
+
+def write_season(year, record):
+    os.makedirs(TRANSACTIONS_DIR, exist_ok=True)
+    tmp = f"{_path(year)}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(record, f)
+    os.replace(tmp, _path(year))
+
+
+def _activity_key(a):
+    return (a['date'], a['owner_id'], a['action'], a['player_id'])
+
+
+def _fetch_activity(league, cursor):
+    '''Page newest-first through the feed until the cursor is reached'''
+    fetched = []
+    offset = 0
+    while True:
+        page = league.recent_activity(size=PAGE_SIZE, offset=offset)
+        for activity in page:
+            if activity.date <= cursor:
+                return fetched
+            for team, action, player, bid in activity.actions:
+                owner_id, _ = history.owner_info(team)
+                fetched.append({
+                    'date': activity.date,
+                    'owner_id': owner_id,
+                    'action': action,
+                    'player_id': getattr(player, 'playerId', None),
+                    'player_name': getattr(player, 'name', ''),
+                    'bid': bid,
+                })
+        if len(page) < PAGE_SIZE:
+            return fetched
+        offset += PAGE_SIZE
+
+
+@tracing.traced('transactions.sync_season')
+def sync_season(year, league=None):
+    '''Bring the stored draft/activity for a season up to date and return it'''
+    # paging is under the lock too, so a second process waiting on a sync
+    # resumes from the cursor it saved instead of fetching the same activity
+    with _season_lock(year):
+        record = read_season(year)
+        if record and record['complete']:
+            return record
+
+        league = league or history.get_league(year)
+        if record is None:
+            record = {'year': year, 'cursor': 0, 'complete': False, 'draft': [], 'activity': []}
+            for pick in league.draft:
+                owner_id, _ = history.owner_info(pick.team)
+                record['draft'].append({
+                    'round': pick.round_num,
+                    'pick': pick.round_pick,
+                    'owner_id': owner_id,
+                    'player_id': pick.playerId,
+                    'player_name': pick.playerName,
+                    'keeper': bool(pick.keeper_status),
+                })
+
+        if year >= FIRST_ACTIVITY_SEASON:
+            new = _fetch_activity(league, record['cursor'])
+            seen = {_activity_key(a) for a in record['activity']}
+            new = [a for a in new if _activity_key(a) not in seen]
+            record['activity'] = sorted(record['activity'] + new, key=lambda a: a['date'])
+            if record['activity']:
+                record['cursor'] = record['activity'][-1]['date']
+
+        # rosters as they stand now; for a finished season that's the final roster
+        record['rosters'] = {history.owner_info(t)[0]: [p.playerId for p in t.roster] for t in league.teams}
+        record['synced_at'] = time.time()
+        record['complete'] = year < history.SEASON_YEAR
+        write_season(year, record)
+        return record
+
+
+def sync(seasons=history.SEASONS):
+    records = {}
+    for year in seasons:
+        try:
+            records[year] = sync_season(year)
+        except Exception as e:
+            print(f"Failed to sync transactions for {year}: {e}")
+    return records
+
+
+# --- Queries ---
+
+def pickup_counts(record):
+    '''Free agent + waiver pickups per owner id'''
+    return Counter(a['owner_id'] for a in record['activity'] if a['action'] in PICKUP_ACTIONS)
+
+
+def draft_retention(record):
+    '''owner id -> (drafted players still rostered, players drafted)'''
+    drafted = defaultdict(set)
+    for pick in record['draft']:
+        drafted[pick['owner_id']].add(pick['player_id'])
+    rosters = {oid: set(ids) for oid, ids in record.get('rosters', {}).items()}
+    return {oid: (len(ids & rosters.get(oid, set())), len(ids)) for oid, ids in drafted.items()}
@@ -0,0 +1,131 @@
+# Cumulative weekly stats and power rankings
+#
+# Every finished (season, week) in the archive becomes one step on a single
+# timeline. For each owner we keep prefix sums along that timeline (points
+# for/against, wins, losses, ties, all-play wins and opponents), so the total
+# for any season/week range is one subtraction, and a weekly power ranking is
+# built from the same arrays.
+from bisect import bisect_left, bisect_right
+import numpy as np
+import history
+import memory
+import tracing
+import owners
+
+METRICS = ('points_for', 'points_against', 'games', 'wins', 'losses', 'ties', 'allplay_wins', 'allplay_games')
+RECENT_WEEKS = 4
+
+_cache = memory.Cache('trends')
+
+
+class Trends(object):
+    def __init__(self, data):
+        seasons = data['seasons']
+        self.weeks = sorted({(year, g['week']) for year in seasons for g in seasons[year]['games'] if g['final']})
+        index = owners.get(data)
+        self.owners = [index.primary_id(k) for k in range(len(index))]
+        self.names = index.names_by_id()
+        week_idx = {yw: i for i, yw in enumerate(self.weeks)}
+        self.owner_idx = {oid: i for i, oid in enumerate(self.owners)}
+
+        scores = np.full((len(self.weeks), len(self.owners)), np.nan)
+        opp = np.full_like(scores, np.nan)
+        for year in seasons:
+            for g in seasons[year]['games']:
+                if not g['final']:
+                    continue
+                t = week_idx[(year, g['week'])]
+                h, a = index.key(g['home_id']), index.key(g['away_id'])
+                scores[t, h], opp[t, h] = g['home_score'], g['away_score']
+                scores[t, a], opp[t, a] = g['away_score'], g['home_score']
+
+        played = ~np.isnan(scores)
+        beats = (scores[:, :, None] > scores[:, None, :]).sum(axis=-1)
+        level = (scores[:, :, None] == scores[:, None, :]).sum(axis=-1) - played  # not counting itself
+        weekly = {
+            'points_for': np.nan_to_num(scores),
+            'points_against': np.nan_to_num(opp),
+            'games': played,
+            'wins': played & (scores > opp),
+            'losses': played & (scores < opp),
+            'ties': played & (scores == opp),
+            'allplay_wins': np.where(played, beats + 0.5 * level, 0),
+            'allplay_games': np.where(played, played.sum(axis=1, keepdims=True) - 1, 0),
+        }
+        # cum[m][t] = total of metric m over timeline steps before t
+        self.cum = {}
+        for metric, values in weekly.items():
+            c = np.zeros((len(self.weeks) + 1, len(self.owners)))
+            np.cumsum(values, axis=0, out=c[1:])
+            self.cum[metric] = c
+
+    def _span(self, start, end):
+        '''Timeline slice [lo, hi) for (year, week) bounds, both inclusive'''
+        lo = 0 if start is None else bisect_left(self.weeks, tuple(start))
+        hi = len(self.weeks) if end is None else bisect_right(self.weeks, tuple(end))
+        return lo, max(lo, hi)
+
+    def totals(self, start=None, end=None):
+        '''Per-owner totals of every metric between two (year, week) points'''
+        lo, hi = self._span(start, end)
+        sums = {m: self.cum[m][hi] - self.cum[m][lo] for m in METRICS}
+        rows = {}
+        for oid, i in self.owner_idx.items():
+            if not sums['games'][i]:
+                continue
+            row = {m: round(float(sums[m][i]), 2) for m in METRICS}
+            row['owner'] = self.names.get(oid, 'Unknown')
+            row['allplay_pct'] = round(row['allplay_wins'] / row['allplay_games'], 3) if row['allplay_games'] else 0
+            rows[oid] = row
+        return rows
+
+    def last_weeks(self, n=RECENT_WEEKS, end=None):
+        '''Totals over the last n weeks of the timeline up to end'''
+        _, hi = self._span(None, end)
+        lo = max(0, hi - n)
+        return self.totals(self.weeks[lo], self.weeks[hi - 1]) if hi else {}
+
+    def power_rankings(self, year):
+        '''Weekly power score and rank per owner for one season
+
+        score = 50% season-to-date all-play pct + 30% all-play pct over the last
+        RECENT_WEEKS weeks + 20% season win pct, on a 0-100 scale
+        '''
+        lo, hi = self._span((year, 0), (year, 99))
+        series = {oid: [] for oid in self.owners}
+        for t in range(lo, hi):
+            recent = max(lo, t + 1 - RECENT_WEEKS)
+
+            def window(metric, start):
+                return self.cum[metric][t + 1] - self.cum[metric][start]
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                season_ap = window('allplay_wins', lo) / window('allplay_games', lo)
+                recent_ap = window('allplay_wins', recent) / window('allplay_games', recent)
+                win_pct = (window('wins', lo) + 0.5 * window('ties', lo)) / window('games', lo)
+            score = 100 * (0.5 * season_ap + 0.3 * recent_ap + 0.2 * win_pct)
+
+            active = ~np.isnan(score)
+            order = np.argsort(-np.where(active, score, -np.inf))
+            ranks = np.empty(len(order), dtype=int)
+            ranks[order] = np.arange(1, len(order) + 1)
+            for oid, i in self.owner_idx.items():
+                if active[i]:
+                    series[oid].append({'week': self.weeks[t][1], 'score': round(float(score[i]), 1),
+                                        'rank': int(ranks[i])})
+        return {oid: s for oid, s in series.items() if s}
+
+
+@tracing.traced('trends.get')
+def get(data):
+    '''Trends for the archive, cached per data version'''
+    version = history.data_version(data)
+    return _cache.get_or_set(version, lambda: Trends(data), clear=True)
+
+
+def parse_point(value, default_week):
+    '''"2023-5" -> (2023, 5); "2023" -> (2023, default_week)'''
+    if not value:
+        return None
+    year, _, week = value.partition('-')
+    return int(year), int(week) if week else default_week
@@ -0,0 +1,172 @@
+# Archive consistency checker
+#
+# ESPN applies stat corrections days after games, long after a week was
+# archived. This samples FRACTION of the archived team-weeks, refetches their
+# seasons (one League fetch each, which carries every score) and, for seasons
+# with stored lineups, the sampled weeks' box scores (one request per week),
+# then compares scores and lineups with the archive and the player warehouse.
+# Only the mismatched game / team records and team-weeks are rewritten. A
+# JSON report goes to DATA_DIR/verify/.
+#
+# It runs as its own low-priority process (niced, pausing between ESPN
+# requests) so it never competes with the dashboard's fetches:
+# python verify.py [--fraction 0.05] [--dry-run] [--loop]
+import os
+import sys
+import json
+import time
+import random
+import history
+import season_store
+import players
+import tracing
+
+REPORT_DIR = os.path.join(history.DATA_DIR, "verify")
+FRACTION = float(os.environ.get("VERIFY_FRACTION", 0.05))  # of archived team-weeks per run
+PAUSE = float(os.environ.get("VERIFY_PAUSE", 2.0))  # seconds between ESPN requests
+INTERVAL = int(os.environ.get("VERIFY_INTERVAL", 6 * 60 * 60))  # seconds between runs with --loop
+NICENESS = 19
+TOLERANCE = 0.005  # points
+
+
+def sample(data, fraction, rnd=random):
+    '''Random (year, week, owner id) team-weeks from the final games of the archive'''
+    team_weeks = [(year, g['week'], oid) for year, season in sorted(data['seasons'].items())
+                  for g in season['games'] if g['final'] for oid in (g['home_id'], g['away_id'])]
+    if not team_weeks:
+        return []
+    return sorted(rnd.sample(team_weeks, max(1, round(len(team_weeks) * fraction))))
+
+
+def _lineup_key(rows, slots):
+    return sorted((int(r['player_id']), slots[r['slot']], float(r['points'])) for r in rows)
+
+
+def same_lineup(stored, espn):
+    '''Same players in the same slots, with points equal within TOLERANCE
+
+    The warehouse keeps points as float32, so rounding both sides could split a
+    value sitting on a rounding boundary.
+    '''
+    return espn is not None and len(stored) == len(espn) and all(
+        a[:2] == b[:2] and abs(a[2] - b[2]) < TOLERANCE for a, b in zip(stored, espn))
+
+
+def check_season(season, picks, store, pause=PAUSE):
+    '''Mismatches of one season's sampled team-weeks: (report entries, fresh season record, {week: box scores})'''
+    year = season['year']
+    league = history.get_league(year)
+    fresh = history.fetch_season(year, league)
+    archived = {(g['week'], oid): g for g in season['games'] for oid in (g['home_id'], g['away_id'])}
+    current = {(g['week'], oid): g for g in fresh['games'] for oid in (g['home_id'], g['away_id'])}
+    team_ids = {t['owner_id']: t['team_id'] for t in season['teams']}
+
+    mismatches = []
+    for _, week, oid in picks:
+        old, new = archived[(week, oid)], current.get((week, oid))
+        if new is None:
+            mismatches.append({'year': year, 'week': week, 'owner_id': oid, 'kind': 'missing game'})
+        elif (abs(old['home_score'] - new['home_score']) > TOLERANCE
+              or abs(old['away_score'] - new['away_score']) > TOLERANCE):
+            mismatches.append({'year': year, 'week': week, 'owner_id': oid, 'kind': 'score', 'game': new,
+                               'archived': [old['home_score'], old['away_score']],
+                               'espn': [new['home_score'], new['away_score']]})
+
+    box_scores = {}
+    if year in store.meta:
+        slots = store.meta[year]['slots']
+        for week in sorted({week for _, week, _ in picks}):
+            time.sleep(pause)
+            box_scores[week] = boxes = league.box_scores(week)
+            espn = {}
+            for box in boxes:
+                for team, lineup in ((box.home_team, box.home_lineup), (box.away_team, box.away_lineup)):
+                    if team and lineup:
+                        espn[team.team_id] = sorted((p.playerId, p.slot_position, float(p.points or 0))
+                                                    for p in lineup)
+            for _, pick_week, oid in picks:
+                if pick_week != week:
+                    continue
+                team_id = team_ids.get(oid)
+                stored = store.team_week(year, week, team_id)
+                # weeks the warehouse never stored are left to players.sync
+                if len(stored) and not same_lineup(_lineup_key(stored, slots), espn.get(team_id)):
+                    mismatches.append({'year': year, 'week': week, 'owner_id': oid, 'team_id': team_id,
+                                       'kind': 'lineup'})
+    return mismatches, fresh, box_scores
+
+
+def repair(mismatches, fresh_seasons, box_scores):
+    '''Rewrite just the mismatched records; returns what was repaired'''
+    repaired = []
+    data = None
+    for year in sorted({m['year'] for m in mismatches if m['kind'] == 'score'}):
+        # both teams of a game may have been sampled
+        games = list({(g['week'], g['home_id']): g for g in
+                      (m['game'] for m in mismatches if m['year'] == year and m['kind'] == 'score')}.values())
+        owners = {oid for g in games for oid in (g['home_id'], g['away_id'])}
+        # team totals and records move with the corrected scores
+        teams = [t for t in fresh_seasons[year]['teams'] if t['owner_id'] in owners]
+        data = history.patch_season(year, games, teams)
+        repaired.append({'year': year, 'games': len(games), 'teams': len(teams)})
+    if data is not None:
+        season_store.publish(data)
+
+    lineups = {}
+    for m in mismatches:
+        if m['kind'] == 'lineup':
+            lineups.setdefault((m['year'], m['week']), set()).add(m['team_id'])
+    for (year, week), team_ids in sorted(lineups.items()):
+        players.replace_team_weeks(year, week, box_scores[year][week], team_ids)
+        repaired.append({'year': year, 'week': week, 'lineups': len(team_ids)})
+    return repaired
+
+
+@tracing.traced('verify.run')
+def run(fraction=FRACTION, fix=True, pause=PAUSE, seed=None):
+    '''One sampling pass; returns the report'''
+    data = history.load_history(offline=True)
+    store = players.get()
+    picks = sample(data, fraction, random.Random(seed))
+    report = {'started': time.strftime('%Y-%m-%dT%H:%M:%S'), 'fraction': fraction, 'sampled': len(picks),
+              'mismatches': [], 'repaired': [], 'errors': []}
+
+    fresh_seasons, box_scores = {}, {}
+    for year in sorted({year for year, _, _ in picks}):
+        try:
+            mismatches, fresh_seasons[year], box_scores[year] = check_season(
+                data['seasons'][year], [p for p in picks if p[0] == year], store, pause)
+            report['mismatches'].extend(mismatches)
+        except Exception as e:
+            print(f"Failed to verify season {year}: {e}")
+            report['errors'].append({'year': year, 'error': f"{type(e).__name__}: {e}"})
+        time.sleep(pause)
+
+    if fix and report['mismatches']:
+        report['repaired'] = repair(report['mismatches'], fresh_seasons, box_scores)
+    for m in report['mismatches']:
+        m.pop('game', None)
+
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    path = os.path.join(REPORT_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Checked {len(picks)} team-weeks: {len(report['mismatches'])} mismatches, "
+          f"{len(report['repaired'])} repairs, {len(report['errors'])} errors ({path})")
+    return report
+
+
+def _arg(name, default):
+    return type(default)(sys.argv[sys.argv.index(name) + 1]) if name in sys.argv else default
+
+
+if __name__ == '__main__':
+    # background work: lowest CPU priority, so dashboard workers always win
+    os.nice(NICENESS)
+    fraction = _arg('--fraction', FRACTION)
+    fix = '--dry-run' not in sys.argv
+    while True:
+        run(fraction, fix=fix)
+        if '--loop' not in sys.argv:
+            break
+        time.sleep(INTERVAL)
@@ -0,0 +1,125 @@
+# Week finalization watcher
+#
+# Polls the current season and notices when a matchup period becomes final:
+# every game of the week is final and its scores haven't moved between two
+# polls (stat corrections land in between). Each newly final week is then
+# pushed through the derived data once - season store, player warehouse,
+# transaction log and optionally the Sheets workbook (only the rows the week
+# changed) and the static site - and recorded in DATA_DIR/watcher.json so it
+# is never processed again. The dashboard workers rebuild their own caches
+# when they remap the new store. Run with: python watcher.py [--once] [--export] [--site]
+import os
+import sys
+import json
+import time
+import history
+import season_store
+import players
+import transactions
+
+STATE_PATH = os.path.join(history.DATA_DIR, "watcher.json")
+POLL_INTERVAL = int(os.environ.get("WATCH_INTERVAL", 10 * 60))  # seconds
+
+
+def read_state(path=STATE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_state(state, path=STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def week_signature(season, week):
+    '''Scores of every game in a week; a final week must keep the same signature for two polls'''
+    return sorted([g['home_id'], g['away_id'], g['home_score'], g['away_score']]
+                  for g in season['games'] if g['week'] == week)
+
+
+def finalized_weeks(season, state):
+    '''Weeks that just became final and stable; updates state['pending'] in place'''
+    final, _ = history.week_status(season)
+    finalized = []
+    for week in final:
+        if week in state['final_weeks']:
+            continue
+        signature = week_signature(season, week)
+        if state['pending'].get(str(week)) == signature:
+            finalized.append(week)
+            del state['pending'][str(week)]
+        else:
+            state['pending'][str(week)] = signature
+    return finalized
+
+
+# --- Incremental updates ---
+
+def on_week_final(data, year, weeks, export=False, site=False):
+    '''Push newly final weeks of one season through everything derived from it'''
+    season = data['seasons'][year]
+    print(f"Week(s) {', '.join(map(str, weeks))} of {year} final, updating")
+
+    # workers remap the new store; every other season's data is unchanged
+    season_store.publish(data)
+
+    # player rows for just the new weeks, activity since the stored cursor
+    if year >= players.FIRST_BOX_SCORE_SEASON:
+        players.sync_season(season)
+    transactions.sync_season(year)
+
+    if export:
+        import export_to_sheets
+        # everything is local now, so the workbook needs no further ESPN calls
+        export_to_sheets.main(offline=True, changed_only=True)
+    if site:
+        import static_site
+        static_site.build()
+
+
+def check(year=history.SEASON_YEAR, export=False, site=False):
+    '''One poll; returns the weeks that were finalized'''
+    # only unfinished seasons are refetched, so this is one ESPN call
+    data = history.load_history(refresh=True)
+    season = data['seasons'].get(year)
+    if season is None:
+        print(f"No {year} season in the archive")
+        return []
+
+    state = read_state()
+    if state is None or state['year'] != year:
+        # first run for this season: weeks already final were handled by full builds
+        final, _ = history.week_status(season)
+        write_state({'year': year, 'final_weeks': final, 'pending': {}})
+        return []
+
+    weeks = finalized_weeks(season, state)
+    if weeks:
+        on_week_final(data, year, weeks, export=export, site=site)
+        state['final_weeks'] = sorted(state['final_weeks'] + weeks)
+    write_state(state)
+    return weeks
+
+
+def run(interval=POLL_INTERVAL, export=False, site=False):
+    while True:
+        try:
+            check(export=export, site=site)
+        except Exception as e:
+            print(f"Watcher check failed: {e}")
+        time.sleep(interval)
+
+
+if __name__ == '__main__':
+    export = '--export' in sys.argv
+    site = '--site' in sys.argv
+    if '--once' in sys.argv:
+        check(export=export, site=site)
+    else:
+        run(export=export, site=site)